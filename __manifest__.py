@@ -12,6 +12,7 @@
     "version": "16.0.0.0.1",
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/product_template_views.xml",
         "views/product_category_views.xml",
         "views/digi_client_views.xml",
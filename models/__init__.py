@@ -1,7 +1,11 @@
 from . import (
+    digi_sync_mixin,
     product_template,
     product_category,
     digi_client,
     res_config_settings,
     barcode_rule,
+    sync_state,
+    outbox,
+    sync_stat,
 )
@@ -1,7 +1,27 @@
-from odoo import fields, models
+from odoo import fields, models, tools
+
+from ..tools.barcode_pattern import BarcodePattern
 
 
 class BarcodeRule(models.Model):
     _inherit = "barcode.rule"
 
     digi_barcode_type_id = fields.Integer(string="Barcode Type ID in @Fresh", default=0)
+
+    def write(self, vals):
+        result = super().write(vals)
+        # The write date has a resolution of seconds, so it can't be relied on
+        # to expire the cached patterns of rules written twice in a second.
+        if {"pattern", "encoding"}.intersection(vals):
+            self.clear_caches()
+        return result
+
+    def _get_barcode_pattern(self):
+        """Return the parsed pattern of the rule, shared by all its products."""
+        self.ensure_one()
+        return self._get_cached_barcode_pattern(self.id, self.write_date)
+
+    @tools.ormcache("rule_id", "write_date")
+    def _get_cached_barcode_pattern(self, rule_id, write_date):
+        rule = self.browse(rule_id)
+        return BarcodePattern(rule.pattern, rule.encoding == "ean13")
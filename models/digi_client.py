@@ -1,26 +1,279 @@
+import base64
+import hashlib
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from json import JSONDecodeError
 
 import requests
 
-from odoo import fields, models
+from odoo import api, fields, models, tools
+from odoo.tools import split_every
+from odoo.tools.safe_eval import safe_eval
 
+from odoo.addons.queue_job.delay import chain, group
+from odoo.addons.queue_job.exception import FailedJobError, RetryableJobError
+from odoo.addons.queue_job.job import identity_exact
+
+from ..tools.async_sender import AsyncSender, httpx
+from ..tools.image_preparer import ImageOptions
+from ..tools.payload_digest import get_digest
 from ..tools.product_transformer import ProductTransformer
+from ..tools.rate_limiter import throttle_registry
+from ..tools.retry_policy import (
+    PAYLOAD,
+    SERVER,
+    THROTTLING,
+    TRANSPORT,
+    RetryPolicy,
+)
+from ..tools.session_pool import session_pool
+from ..tools.sync_metrics import sync_metrics
+
+_logger = logging.getLogger(__name__)
 
 
 class DigiApiException(Exception):
     pass
 
 
+def classify_exception(exception):
+    """Return the retry category of an exception raised while syncing."""
+    if isinstance(exception, DigiApiException):
+        # @Fresh processed the request and rejected it
+        return PAYLOAD
+    if isinstance(exception, JSONDecodeError):
+        return SERVER
+    if isinstance(exception, requests.ConnectionError | requests.Timeout):
+        return TRANSPORT
+    if httpx is not None and isinstance(exception, httpx.TransportError):
+        return TRANSPORT
+    # HTTP errors of both requests and httpx carry the response
+    response = getattr(exception, "response", None)
+    if response is not None:
+        status_code = response.status_code
+        if status_code == 429:
+            return THROTTLING
+        if status_code < 500:
+            return PAYLOAD
+    return SERVER
+
+
 class DigiClient(models.Model):
     _name = "product_digi_sync.digi_client"
     _description = "Digi Client"
 
     DEFAULT_FRESH_URL = "https://fresh.digi.eu:8010/API/V1"
+    DEFAULT_BATCH_SIZE = 50
+    DEFAULT_POOL_SIZE = 4
+    DEFAULT_FULL_SYNC_CONCURRENCY = 4
+    SESSION_FIELDS = {"api_url", "username", "password", "pool_size"}
+    # Images larger than this (in base64 bytes) are streamed into the request.
+    STREAM_IMAGE_THRESHOLD = 256 * 1024
+    # Number of records per page when listing what @Fresh holds
+    RECONCILE_PAGE_SIZE = 500
 
     name = fields.Char(required=True)
     username = fields.Char("@Fresh Username", required=True)
     password = fields.Char("@Fresh Password", required=True)
     api_url = fields.Char(required=True, default=DEFAULT_FRESH_URL)
+    batch_size = fields.Integer(
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of products that are sent to @Fresh in a single job.",
+    )
+    pool_size = fields.Integer(
+        default=DEFAULT_POOL_SIZE,
+        help="Maximum number of connections to @Fresh kept open per worker.",
+    )
+    image_max_size = fields.Integer(
+        help="Downscale images so that neither side exceeds this number of "
+        "pixels. Leave empty to send images in their original size.",
+    )
+    image_format = fields.Selection(
+        [("original", "Original"), ("jpeg", "JPEG"), ("png", "PNG")],
+        default="original",
+        required=True,
+    )
+    image_quality = fields.Integer(
+        help="Quality (1-100) used when re-encoding images. "
+        "Leave empty to use the default quality of the format.",
+    )
+    rate_limit = fields.Float(
+        help="Maximum number of requests per second sent to @Fresh by each "
+        "worker process. The workers don't share the limit, so @Fresh receives "
+        "up to this rate times the number of workers running sync jobs. Leave "
+        "empty for no limit.",
+    )
+    rate_limit_burst = fields.Integer(
+        default=10,
+        help="Number of requests that may be sent at once before the rate "
+        "limit applies.",
+    )
+    retry_base_delay = fields.Integer(
+        default=5,
+        help="Seconds to wait before the first retry of a failed job. The delay "
+        "doubles with every retry.",
+    )
+    retry_max_delay = fields.Integer(
+        default=600, help="Maximum number of seconds between retries."
+    )
+    retry_max_attempts = fields.Integer(
+        default=5,
+        help="Number of attempts after which a failing job is given up.",
+    )
+    delivery_mode = fields.Selection(
+        [("jobs", "A job per change"), ("outbox", "Outbox")],
+        default="jobs",
+        required=True,
+        help="With the outbox, changes are collected and sent in batch jobs "
+        "every minute, instead of in a job per change.",
+    )
+    receive_changes = fields.Boolean(
+        help="Send changed products and categories to this client too, next to "
+        "the client configured in the settings.",
+    )
+    product_domain = fields.Char(
+        default="[]",
+        help="Only products matching this domain are sent to this client.",
+    )
+    category_domain = fields.Char(
+        default="[]",
+        help="Only categories matching this domain are sent to this client.",
+    )
+    pos_config_id = fields.Many2one(
+        "pos.config",
+        string="Point of Sale",
+        help="Only send the products available in this point of sale.",
+    )
+    debounce_delay = fields.Integer(
+        help="Wait until a record was left unchanged for this many seconds "
+        "before sending it, so only its settled state reaches @Fresh.",
+    )
+    full_sync_concurrency = fields.Integer(
+        default=DEFAULT_FULL_SYNC_CONCURRENCY,
+        help="Maximum number of requests in flight during a full sync.",
+    )
+    sender_engine = fields.Selection(
+        [("threads", "Threads"), ("asyncio", "Asyncio")],
+        default="threads",
+        required=True,
+        help="How batches of requests are sent concurrently. Asyncio sends all "
+        "requests from one thread and requires the httpx python package.",
+    )
+    full_sync_state = fields.Selection(
+        [("idle", "Idle"), ("running", "Running"), ("done", "Done")],
+        default="idle",
+        required=True,
+        readonly=True,
+        copy=False,
+    )
+    full_sync_category_checkpoint = fields.Integer(readonly=True, copy=False)
+    full_sync_product_checkpoint = fields.Integer(readonly=True, copy=False)
+    full_sync_started_at = fields.Datetime(readonly=True, copy=False)
+    full_sync_sent_count = fields.Integer(readonly=True, copy=False)
+    full_sync_failed_count = fields.Integer(readonly=True, copy=False)
+    full_sync_summary = fields.Text(readonly=True, copy=False)
+    stat_ids = fields.One2many(
+        "product_digi_sync.sync_stat", "client_id", string="Statistics"
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records.filtered("receive_changes"):
+            self.clear_caches()
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        if self.SESSION_FIELDS.intersection(vals):
+            self._discard_sessions()
+        if "receive_changes" in vals:
+            self.clear_caches()
+        return result
+
+    def unlink(self):
+        self._discard_sessions()
+        result = super().unlink()
+        # The configured client may be gone
+        self.clear_caches()
+        return result
+
+    @api.model
+    def _get_configured_client(self):
+        """Return the client of the settings, empty when syncing is disabled."""
+        return self.browse(self._get_configured_client_id())
+
+    @api.model
+    @tools.ormcache()
+    def _get_configured_client_id(self):
+        # Cached per registry. Changing the settings writes the config
+        # parameters, which clears the cache, and so does deleting a client.
+        # Other writes to clients can't change which client is configured.
+        if not self._is_sync_enabled():
+            return None
+        digi_client_id = (
+            self.env["ir.config_parameter"].sudo().get_param("digi_client_id")
+        )
+        try:
+            digi_client_id = int(digi_client_id)
+        except (TypeError, ValueError):
+            return None
+        return self.sudo().browse(digi_client_id).exists().id or None
+
+    @api.model
+    def _get_sync_clients(self):
+        """Return the configured client, then the other clients receiving changes."""
+        return self.browse(self._get_sync_client_ids())
+
+    @api.model
+    @tools.ormcache()
+    def _get_sync_client_ids(self):
+        configured_id = self._get_configured_client_id()
+        if not configured_id:
+            return ()
+        other_ids = self.sudo().search([("receive_changes", "=", True)]).ids
+        return tuple(
+            [configured_id]
+            + [client_id for client_id in other_ids if client_id != configured_id]
+        )
+
+    def _get_digi_domain(self, model_name):
+        """Return the domain of the records of the model routed to this client."""
+        self.ensure_one()
+        if model_name == "product.category":
+            return safe_eval(self.category_domain or "[]")
+        domain = safe_eval(self.product_domain or "[]")
+        if self.pos_config_id:
+            domain += [("available_in_pos", "=", True)]
+            if (
+                self.pos_config_id.limit_categories
+                and self.pos_config_id.iface_available_categ_ids
+            ):
+                domain += [
+                    (
+                        "pos_categ_id",
+                        "in",
+                        self.pos_config_id.iface_available_categ_ids.ids,
+                    )
+                ]
+        return domain
+
+    def _filter_digi_records(self, records):
+        """Return the records that are routed to this client."""
+        domain = self._get_digi_domain(records._name)
+        return records.filtered_domain(domain) if domain else records
+
+    @api.model
+    def _is_sync_enabled(self):
+        enabled = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("digi_sync_products_enabled", "False")
+        )
+        return enabled not in ("False", "0", "")
 
     def send_product_to_digi(self, product):
         self.ensure_one()
@@ -28,15 +281,108 @@ class DigiClient(models.Model):
 
         body = ProductTransformer.transform_product_to_payload(product)
 
-        self._post_to_digi(url, body)
+        self._deliver(url, body, product, "article")
 
-    def send_product_image_to_digi(self, product):
+    def send_products_to_digi(self, products):
+        """Post the articles one by one, and return the ones @Fresh rejected."""
         self.ensure_one()
+        # Products deleted while the job was queued can't be read anymore
+        products = products.exists()
+        url = self.create_article_url()
+        errors = []
+
+        bodies = ProductTransformer.transform_products_to_payloads(products)
+        try:
+            for body in bodies:
+                try:
+                    self._post_to_digi(url, body)
+                except Exception as e:
+                    errors.append(str(e))
+                    if classify_exception(e) != PAYLOAD:
+                        raise
+                else:
+                    errors.append(None)
+        finally:
+            sent_count = len(errors)
+            self._record_deliveries(
+                products[:sent_count], "article", errors, bodies[:sent_count]
+            )
+        return [
+            (product, error)
+            for product, error in zip(products, errors, strict=True)
+            if error
+        ]
+
+    def get_batch_size(self):
+        self.ensure_one()
+        return self.batch_size if self.batch_size > 0 else self.DEFAULT_BATCH_SIZE
+
+    def send_product_image_to_digi(self, product, force=False):
+        """Upload the image if the client misses it, and return whether it did."""
+        self.ensure_one()
+        sync_state = self.env["product_digi_sync.sync_state"]
+        checksum = self._get_image_checksum(product)
+        image_hash = self._get_image_hash(product, checksum)
+        if (
+            not force
+            and sync_state._get_payload_hash(self, product, "image") == image_hash
+        ):
+            # Up to date, so incremental resyncs don't find the image stale again
+            self._record_deliveries(product, "image", [None])
+            return False
+
         url = self.create_image_url()
 
-        body = ProductTransformer.transform_product_to_image_payload(product)
+        if len(product.image_1920) > self.STREAM_IMAGE_THRESHOLD:
+            transform = ProductTransformer.stream_product_to_image_payload
+        else:
+            transform = ProductTransformer.transform_product_to_image_payload
+        body = transform(product, self._get_image_options(), checksum)
 
-        self._post_to_digi(url, body)
+        self._deliver(url, body, product, "image")
+        sync_state._set_payload_hash(self, product, "image", image_hash)
+        return True
+
+    def _get_image_checksum(self, product):
+        """Return the checksum of the image, from its attachment when possible."""
+        attachment = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", product._name),
+                    ("res_field", "=", "image_1920"),
+                    ("res_id", "=", product.id),
+                ],
+                limit=1,
+            )
+        )
+        return (
+            attachment.checksum
+            or hashlib.sha1(base64.b64decode(product.image_1920)).hexdigest()
+        )
+
+    def _get_image_hash(self, product, checksum):
+        """Hash the image, plu code, name and image options of the product."""
+        # The uploaded payload carries the name, so a rename uploads it again
+        name_hash = hashlib.sha1((product.name or "").encode()).hexdigest()
+        image_hash = f"{product.plu_code}:{checksum}:{name_hash}"
+        image_options = self._get_image_options()
+        if image_options:
+            image_hash = f"{image_hash}:{tuple(image_options)}"
+        return image_hash
+
+    def _get_image_options(self):
+        """Return the image preparation options, or None to send the original."""
+        self.ensure_one()
+        output_format = self.image_format if self.image_format != "original" else ""
+        if not (self.image_max_size or output_format or self.image_quality):
+            return None
+        return ImageOptions(
+            max_size=max(self.image_max_size, 0),
+            output_format=output_format,
+            quality=min(max(self.image_quality, 0), 100),
+        )
 
     def send_category_to_digi(self, product_category):
         self.ensure_one()
@@ -46,13 +392,541 @@ class DigiClient(models.Model):
             product_category
         )
 
-        self._post_to_digi(url, body)
+        self._deliver(url, body, product_category, "category")
+
+    @api.model
+    def _send_to_clients(self, clients, records, kind):
+        """Send the records to all their clients, and return the failures."""
+        records = records.exists()
+        routed = {}
+        for client in clients:
+            client_records = client._filter_digi_records(records)
+            if client_records:
+                routed[client] = client_records
+        if not routed:
+            return []
+
+        to_send = records.browse()
+        for client_records in routed.values():
+            to_send |= client_records
+        bodies = dict(zip(to_send.ids, self._get_payloads(to_send, kind), strict=True))
+        # Everything that needs the ORM is prepared here, the threads only post
+        jobs = {}
+        for client, client_records in routed.items():
+            url = client._get_url(kind)
+            items = [(url, bodies[record.id]) for record in client_records]
+            jobs[client] = (client._get_many_sender(), items)
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = {
+                client: executor.submit(sender, items)
+                for client, (sender, items) in jobs.items()
+            }
+            results = {client: future.result() for client, future in futures.items()}
+
+        failures = []
+        for client, errors in results.items():
+            client_records = routed[client]
+            client._record_deliveries(
+                client_records,
+                kind,
+                errors,
+                [bodies[record.id] for record in client_records],
+            )
+            client._store_metrics()
+            failures += [
+                (client, record, error)
+                for record, error in zip(client_records, errors, strict=True)
+                if error
+            ]
+        return failures
+
+    def _deliver(self, url, body, record, kind):
+        """Post the payload of the record, and store how that went."""
+        try:
+            self._post_to_digi(url, body)
+        except Exception as e:
+            self._record_deliveries(record, kind, [str(e)])
+            raise
+        # Images have a hash of their own, see send_product_image_to_digi()
+        payloads = None if kind == "image" else [body]
+        self._record_deliveries(record, kind, [None], payloads)
+
+    def _record_deliveries(self, records, kind, errors, payloads=None):
+        self.ensure_one()
+        self.env["product_digi_sync.sync_state"]._record_deliveries(
+            self, records, kind, errors, payloads
+        )
+
+    def action_reset_stats(self):
+        self.stat_ids.unlink()
+        self.env["product_digi_sync.sync_stat_sample"].search(
+            [("client_id", "in", self.ids)]
+        ).unlink()
+
+    @contextmanager
+    def _measure_job(self, kind):
+        """Measure a job of this client, and store the metrics."""
+        self.ensure_one()
+        key = self._get_session_key()
+        try:
+            with sync_metrics.scope(key), sync_metrics.measure(
+                "job", kind
+            ) as observation:
+                try:
+                    yield
+                except RetryableJobError:
+                    observation.retries = 1
+                    raise
+        finally:
+            self._store_metrics()
+
+    def _store_metrics(self):
+        """Store the metrics of this worker, or keep them for the next job."""
+        self.ensure_one()
+        key = self._get_session_key()
+        popped = sync_metrics.pop(key)
+        if not popped:
+            return
+        try:
+            with self.env.cr.savepoint():
+                self.env["product_digi_sync.sync_stat_sample"].sudo()._add_samples(
+                    self, popped
+                )
+        except Exception as e:
+            _logger.debug("Keeping @Fresh sync metrics for the next job: %s", e)
+            sync_metrics.restore(key, popped)
+            return
+        self.env.cr.postrollback.add(partial(sync_metrics.restore, key, popped))
+
+    def action_full_sync(self):
+        for client in self:
+            client.full_sync()
+
+    def action_resume_full_sync(self):
+        for client in self:
+            client.full_sync(resume=True)
+
+    def action_incremental_resync(self):
+        for client in self:
+            client.incremental_resync()
+
+    @api.model
+    def _cron_incremental_resync(self):
+        for client in self._get_sync_clients():
+            client.incremental_resync()
+
+    def incremental_resync(self):
+        """Queue the records this client is not up to date with, per kind."""
+        self.ensure_one()
+        sync_state = self.env["product_digi_sync.sync_state"]
+        records_by_kind = {}
+        for kind, (model_name, _condition) in sync_state.RESYNC_TARGETS.items():
+            records = self._filter_digi_records(
+                self.env[model_name].browse(
+                    sync_state._get_stale_record_ids(self, kind)
+                )
+            )
+            records_by_kind[kind] = self._filter_changed_records(records, kind)
+        self._queue_records(records_by_kind)
+        counts = {kind: len(records) for kind, records in records_by_kind.items()}
+        _logger.info(
+            "Incremental resync to @Fresh for client %s queued %s",
+            self.name,
+            ", ".join(f"{count} {kind}s" for kind, count in counts.items()),
+        )
+        return counts
+
+    def _filter_changed_records(self, records, kind):
+        """Return the records whose payload differs from what was last sent."""
+        if kind == "image":
+            # The image jobs compare the image hashes themselves
+            return records
+        return self.env["product_digi_sync.sync_state"]._filter_changed(
+            self, records, kind, self._get_payloads(records, kind)
+        )
+
+    def _queue_records(self, records_by_kind):
+        """Queue batch jobs sending the records to this client only."""
+        self.ensure_one()
+        self._queue_batches(records_by_kind, self.get_batch_size(), self)
+
+    @api.model
+    def _queue_batches(self, records_by_kind, batch_size, client=None, **kwargs):
+        """Queue batch jobs for the records, kind after kind."""
+        # The jobs of a kind wait for those of the kinds before it, so articles
+        # are only sent once their main groups exist.
+        groups = []
+        for kind, records in records_by_kind.items():
+            jobs = [
+                batch._digi_send_delayable(kind, client, **kwargs)
+                for batch in split_every(batch_size, records.ids, records.browse)
+            ]
+            if jobs:
+                groups.append(group(*jobs))
+        if groups:
+            chain(*groups).delay()
+
+    @api.model
+    def _get_payloads(self, records, kind):
+        """Return the article or category payloads of the records, in order."""
+        if kind == "category":
+            return [
+                ProductTransformer.transform_product_category_to_payload(record)
+                for record in records
+            ]
+        return ProductTransformer.transform_products_to_payloads(records)
+
+    def action_reconcile(self):
+        for client in self:
+            client.with_delay(identity_key=identity_exact).reconcile()
+
+    def reconcile(self):
+        """Queue the records @Fresh misses or holds different data for."""
+        self.ensure_one()
+        counts = {}
+        to_send = {}
+        with self._measure_job("reconcile"):
+            for kind in ("category", "article"):
+                counts[kind], to_send[kind] = self._reconcile_kind(kind)
+            self._queue_records(to_send)
+        _logger.info(
+            "Reconciled @Fresh client %s with Odoo: %s", self.name, json.dumps(counts)
+        )
+        return counts
+
+    def _reconcile_kind(self, kind):
+        if kind == "category":
+            records = self.env["product.category"].search(
+                [("external_digi_id", ">", 0)]
+                + self._get_digi_domain("product.category")
+            )
+        else:
+            records = self.env["product.template"].search(
+                [("plu_code", ">", 0)] + self._get_digi_domain("product.template")
+            )
+        bodies = self._get_payloads(records, kind)
+        local = {}
+        for record, body in zip(records, bodies, strict=True):
+            payload = json.loads(body)
+            local[payload["DataId"]] = (record, body, get_digest(payload))
+
+        seen = set()
+        in_sync = {}
+        unknown_count = 0
+        for remote in self._list_from_digi(kind):
+            data_id = remote.get("DataId")
+            if data_id not in local:
+                unknown_count += 1
+                continue
+            seen.add(data_id)
+            record, body, digest = local[data_id]
+            if get_digest(remote, json.loads(body)) == digest:
+                in_sync[record] = body
+
+        # Store what @Fresh already holds as sent, so resyncs leave it alone
+        synced = records.browse([record.id for record in in_sync])
+        self._record_deliveries(
+            synced, kind, [None] * len(synced), list(in_sync.values())
+        )
+        counts = {
+            "in_sync": len(synced),
+            "missing": len(set(local) - seen),
+            "divergent": len(seen) - len(synced),
+            "unknown": unknown_count,
+        }
+        return counts, records - synced
+
+    def _list_from_digi(self, kind):
+        """Yield the records @Fresh holds for the kind, fetched page by page."""
+        url = self._get_list_url(kind)
+        session = self._get_session()
+        throttle = self._get_throttle()
+        key = self._get_session_key()
+        page_number = 1
+        while True:
+            items = self._get_page(
+                session,
+                url,
+                {"PageNumber": page_number, "PageSize": self.RECONCILE_PAGE_SIZE},
+                throttle,
+                key,
+            )
+            yield from items
+            if len(items) < self.RECONCILE_PAGE_SIZE:
+                return
+            page_number += 1
+
+    def full_sync(self, resume=False):
+        """Send all categories and products, resuming at the checkpoint if asked."""
+        self.ensure_one()
+        if resume and self.full_sync_state == "running":
+            _logger.info("Resuming full sync to @Fresh for client %s", self.name)
+        else:
+            self.write(
+                {
+                    "full_sync_state": "running",
+                    "full_sync_category_checkpoint": 0,
+                    "full_sync_product_checkpoint": 0,
+                    "full_sync_started_at": fields.Datetime.now(),
+                    "full_sync_sent_count": 0,
+                    "full_sync_failed_count": 0,
+                    "full_sync_summary": False,
+                }
+            )
+        self.with_delay(identity_key=identity_exact)._full_sync_step()
+
+    def _full_sync_step(self):
+        self.ensure_one()
+        if self.full_sync_state != "running":
+            return "No full sync is running."
+        with self._measure_job("full_sync"):
+            return self._send_full_sync_batch()
+
+    def _send_full_sync_batch(self):
+        batch_size = self.get_batch_size()
+        categories = self.env["product.category"].search(
+            [
+                ("external_digi_id", ">", 0),
+                ("id", ">", self.full_sync_category_checkpoint),
+            ]
+            + self._get_digi_domain("product.category"),
+            order="id",
+            limit=batch_size,
+        )
+        if categories:
+            records = categories
+            kind = "category"
+            url = self.create_category_url()
+            bodies = [
+                ProductTransformer.transform_product_category_to_payload(category)
+                for category in categories
+            ]
+            checkpoint_field = "full_sync_category_checkpoint"
+        else:
+            records = self.env["product.template"].search(
+                [
+                    ("plu_code", ">", 0),
+                    ("id", ">", self.full_sync_product_checkpoint),
+                ]
+                + self._get_digi_domain("product.template"),
+                order="id",
+                limit=batch_size,
+            )
+            kind = "article"
+            url = self.create_article_url()
+            bodies = ProductTransformer.transform_products_to_payloads(records)
+            checkpoint_field = "full_sync_product_checkpoint"
+
+        if not records:
+            return self._finish_full_sync()
+
+        errors = self._post_many_to_digi([(url, body) for body in bodies])
+        for error in errors:
+            if error and classify_exception(error) != PAYLOAD:
+                # @Fresh is failing, not the records: the same batch is retried
+                # with backoff, and the checkpoint stays where it is.
+                self._handle_job_exception(error)
+        self._record_deliveries(records, kind, errors, bodies)
+        for record, error in zip(records, errors, strict=True):
+            if error:
+                _logger.warning(
+                    "Full sync of %s %s to @Fresh failed: %s",
+                    record._name,
+                    record.id,
+                    error,
+                )
+        failed_count = len([error for error in errors if error])
+        self.write(
+            {
+                checkpoint_field: records[-1].id,
+                "full_sync_sent_count": self.full_sync_sent_count
+                + len(records)
+                - failed_count,
+                "full_sync_failed_count": self.full_sync_failed_count + failed_count,
+            }
+        )
+        self.with_delay(identity_key=identity_exact)._full_sync_step()
+        return f"Sent {len(records) - failed_count} of {len(records)} {records._name}."
+
+    def _finish_full_sync(self):
+        duration = (
+            fields.Datetime.now() - self.full_sync_started_at
+        ).total_seconds() or 1
+        total = self.full_sync_sent_count + self.full_sync_failed_count
+        summary = (
+            f"Sent {self.full_sync_sent_count} of {total} records "
+            f"({self.full_sync_failed_count} failed) in {duration:.0f} seconds, "
+            f"{total / duration:.1f} records per second."
+        )
+        _logger.info("Full sync to @Fresh for client %s done: %s", self.name, summary)
+        self.write({"full_sync_state": "done", "full_sync_summary": summary})
+        return summary
+
+    def _post_many_to_digi(self, items):
+        """Post the (url, body) items concurrently, and return an error per item."""
+        return self._get_many_sender()(items)
+
+    def _get_many_sender(self):
+        """Return a function posting (url, body) items, usable in another thread."""
+        self.ensure_one()
+        key = self._get_session_key()
+        if self.sender_engine == "asyncio":
+            if AsyncSender.is_available():
+                async_sender = self._get_async_sender()
+
+                def send_async(items):
+                    with sync_metrics.measure("request_batch", key=key) as observation:
+                        observation.payload_bytes = sum(len(body) for _, body in items)
+                        return async_sender.send(items)
+
+                return send_async
+            _logger.warning(
+                "The httpx package is not installed, sending with threads instead."
+            )
+
+        session = self._get_session()
+        throttle = self._get_throttle()
+        concurrency = self.get_full_sync_concurrency()
+
+        def post(item):
+            try:
+                DigiClient._send_request(session, item[0], item[1], throttle, key)
+            except Exception as e:
+                return e
+            return None
+
+        def send(items):
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                return list(executor.map(post, items))
+
+        return send
+
+    def _get_async_sender(self):
+        self.ensure_one()
+        return AsyncSender(
+            self.create_header(),
+            self.get_full_sync_concurrency(),
+            self._check_response,
+            rate_limiter=self._get_throttle().bucket,
+        )
+
+    def _handle_job_exception(self, exception):
+        """Retry the job on transient errors, and fail it on payload errors."""
+        self.ensure_one()
+        category = classify_exception(exception)
+        if category == PAYLOAD:
+            raise FailedJobError(
+                f"@Fresh rejected the request, not retrying: {exception}"
+            ) from exception
+
+        attempt = self._get_job_attempt()
+        policy = self._get_retry_policy()
+        if not policy.should_retry(category, attempt):
+            raise FailedJobError(
+                f"Giving up after {attempt} attempts ({category} error): {exception}"
+            ) from exception
+
+        raise RetryableJobError(
+            f"Retrying {category} error: {exception}",
+            seconds=self._get_retry_delay(exception, attempt),
+        ) from exception
+
+    def _get_retry_delay(self, exception, attempt=1):
+        """Return the number of seconds to wait before retrying after the error."""
+        self.ensure_one()
+        delay = self._get_retry_policy().get_delay(
+            attempt, minimum=self._get_retry_after(exception)
+        )
+        return round(delay)
+
+    def _get_retry_policy(self):
+        self.ensure_one()
+        return RetryPolicy(
+            self.retry_base_delay, self.retry_max_delay, self.retry_max_attempts
+        )
+
+    def _get_job_attempt(self):
+        """Return which attempt of the currently running job this is."""
+        job_uuid = self.env.context.get("job_uuid")
+        if not job_uuid:
+            return 1
+        job = self.env["queue.job"].sudo().search([("uuid", "=", job_uuid)], limit=1)
+        # The retry counter of the running job is only stored after it ran
+        return job.retry + 1
+
+    @staticmethod
+    def _get_retry_after(exception):
+        response = getattr(exception, "response", None)
+        if response is None:
+            return 0
+        retry_after = response.headers.get("Retry-After", "")
+        return int(retry_after) if retry_after.isdigit() else 0
+
+    def get_full_sync_concurrency(self):
+        self.ensure_one()
+        return (
+            self.full_sync_concurrency
+            if self.full_sync_concurrency > 0
+            else self.DEFAULT_FULL_SYNC_CONCURRENCY
+        )
 
     def _post_to_digi(self, url, body):
-        headers = self.create_header()
-        response = requests.post(
-            url=url, headers=headers, data=body, timeout=30, allow_redirects=False
+        self._send_request(
+            self._get_session(),
+            url,
+            body,
+            self._get_throttle(),
+            self._get_session_key(),
         )
+
+    @staticmethod
+    def _send_request(session, url, body, throttle=None, metrics_key=None):
+        # Runs outside of the ORM (possibly in another thread), so it must only
+        # use its arguments.
+        with sync_metrics.measure(
+            "request", DigiClient._get_endpoint(url), metrics_key
+        ) as observation:
+            observation.payload_bytes = len(body)
+            response = DigiClient._throttled(
+                throttle, session.post, url=url, data=body, timeout=30
+            )
+            DigiClient._check_response(response)
+
+    @staticmethod
+    def _get_page(session, url, params, throttle=None, metrics_key=None):
+        """Return the records of a page of an @Fresh list."""
+        with sync_metrics.measure(
+            "list", DigiClient._get_endpoint(url), metrics_key
+        ) as observation:
+            response = DigiClient._throttled(
+                throttle, session.get, url=url, params=params, timeout=30
+            )
+            observation.payload_bytes = len(response.content)
+            DigiClient._check_response(response)
+            return response.json().get("DataList") or []
+
+    @staticmethod
+    def _throttled(throttle, request, **kwargs):
+        """Do the request within the limits of the throttle, if any."""
+        if throttle:
+            throttle.acquire()
+        overloaded = True
+        try:
+            response = request(allow_redirects=False, **kwargs)
+            overloaded = response.status_code == 429 or response.status_code >= 500
+        finally:
+            if throttle:
+                throttle.release(overloaded)
+        return response
+
+    @staticmethod
+    def _get_endpoint(url):
+        """Return the service part of an @Fresh url, like ``ARTICLE.SVC``."""
+        return url.rstrip("/").rsplit("/", 2)[-2]
+
+    @staticmethod
+    def _check_response(response):
+        response.raise_for_status()
         response_json = response.json()
 
         if "Result" in response_json and response_json["Result"] != 1:
@@ -60,6 +934,37 @@ class DigiClient(models.Model):
                 f"Error {response_json['Result']}: {response_json['ResultDescription']}"
             )
 
+    def _get_session(self):
+        """Return the pooled session of this client for the current worker."""
+        self.ensure_one()
+        pool_size = self._get_pool_size()
+        signature = (self.get_api_url(), self.username, self.password, pool_size)
+        return session_pool.get(
+            self._get_session_key(), signature, self.create_header, pool_size
+        )
+
+    def _get_pool_size(self):
+        pool_size = self.pool_size if self.pool_size > 0 else self.DEFAULT_POOL_SIZE
+        # Keep a connection open for every concurrent request of a full sync.
+        return max(pool_size, self.get_full_sync_concurrency())
+
+    def _get_throttle(self):
+        """Return the throttle of this client in this worker."""
+        self.ensure_one()
+        return throttle_registry.get(
+            self._get_session_key(),
+            self.rate_limit,
+            self.rate_limit_burst,
+            self._get_pool_size(),
+        )
+
+    def _get_session_key(self):
+        return (self.env.cr.dbname, self.id)
+
+    def _discard_sessions(self):
+        for client in self:
+            session_pool.discard(client._get_session_key())
+
     def create_article_url(self):
         url = f"{self.get_api_url()}/ARTICLE.SVC/POST"
         return url
@@ -76,6 +981,17 @@ class DigiClient(models.Model):
         url = f"{self.get_api_url()}/MAINGROUP.SVC/POST"
         return url
 
+    def _get_url(self, kind):
+        if kind == "category":
+            return self.create_category_url()
+        if kind == "image":
+            return self.create_image_url()
+        return self.create_article_url()
+
+    def _get_list_url(self, kind):
+        """Return the url listing what @Fresh holds for the kind."""
+        return f"{self._get_url(kind).rsplit('/', 1)[0]}/GET"
+
     def create_header(self):
         self.ensure_one()
         headers = {
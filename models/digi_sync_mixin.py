@@ -0,0 +1,171 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from odoo import fields, models
+
+from ..tools.product_transformer import ProductTransformer
+from ..tools.retry_policy import PAYLOAD
+from .digi_client import classify_exception
+
+_logger = logging.getLogger(__name__)
+
+
+class DigiSyncMixin(models.AbstractModel):
+    _name = "product_digi_sync.sync_mixin"
+    _description = "Digi Sync Mixin"
+
+    def _digi_with_delay(self, kind, client=None, **kwargs):
+        """Delay a job on these records, keeping one pending job per kind."""
+        return self.with_delay(**self._get_digi_delay_options(kind, client, **kwargs))
+
+    def _digi_delayable(self, kind, client=None, **kwargs):
+        """Like ``_digi_with_delay()``, for a job in a chain or group of jobs."""
+        return self.delayable(**self._get_digi_delay_options(kind, client, **kwargs))
+
+    def _digi_send_delayable(self, kind, client=None, **kwargs):
+        """Return the job sending the records, for a chain or group of jobs."""
+        delayable = self._digi_delayable(kind, client, **kwargs)
+        if kind == "image":
+            return delayable.send_image_to_digi_directly(client=client)
+        return delayable.send_to_digi_directly(client=client)
+
+    def _get_digi_delay_options(self, kind, client=None, **kwargs):
+        identity_key = self._get_digi_identity_key(kind, client)
+        # The retry policy of the client decides when to give up
+        kwargs.setdefault("max_retries", 0)
+        client = (
+            client or self.env["product_digi_sync.digi_client"]._get_configured_client()
+        )
+        if client.debounce_delay > 0 and "eta" not in kwargs:
+            # Postpone the pending job until the records are left alone
+            eta = fields.Datetime.now() + timedelta(seconds=client.debounce_delay)
+            self.env["queue.job"].sudo().search(
+                [("identity_key", "=", identity_key), ("state", "=", "pending")]
+            ).write({"eta": eta})
+            kwargs["eta"] = eta
+        return dict(kwargs, identity_key=identity_key)
+
+    def _get_digi_identity_key(self, kind, client=None):
+        # Batches are keyed on their whole set of records, so the key alone
+        # doesn't stop a record from being in several pending jobs: see
+        # ``_filter_digi_unqueued()``.
+        if len(self) == 1:
+            records_key = str(self.id)
+        else:
+            records_key = hashlib.sha1(
+                ",".join(str(record_id) for record_id in sorted(self.ids)).encode()
+            ).hexdigest()
+        return f"{self._get_digi_identity_prefix(kind, client)}{records_key}"
+
+    def _get_digi_identity_prefix(self, kind, client=None):
+        if client:
+            # Jobs for a single client don't replace the jobs for all clients
+            kind = f"{kind}@{client.id}"
+        return f"product_digi_sync:{self._name}:{kind}:"
+
+    def _filter_digi_unqueued(self, kind, client=None):
+        """Return the records that are not in a pending job of this kind yet.
+
+        Jobs read the records when they run, so a pending job sends the latest
+        changes of its records as well. It is postponed instead, like a
+        debounced job.
+        """
+        jobs = (
+            self.env["queue.job"]
+            .sudo()
+            .search(
+                [
+                    (
+                        "identity_key",
+                        "=like",
+                        f"{self._get_digi_identity_prefix(kind, client)}%",
+                    ),
+                    ("state", "in", ("wait_dependencies", "pending")),
+                ]
+            )
+            .filtered(lambda job: set(job.record_ids) & set(self.ids))
+        )
+        if not jobs:
+            return self
+        client = (
+            client or self.env["product_digi_sync.digi_client"]._get_configured_client()
+        )
+        if client.debounce_delay > 0:
+            jobs.write(
+                {
+                    "eta": fields.Datetime.now()
+                    + timedelta(seconds=client.debounce_delay)
+                }
+            )
+        queued_ids = {record_id for job in jobs for record_id in job.record_ids}
+        return self.filtered(lambda record: record.id not in queued_ids)
+
+    def _get_digi_client(self):
+        """Return the configured client, or nothing when syncing is disabled."""
+        client_model = self.env["product_digi_sync.digi_client"]
+        client = client_model._get_configured_client()
+        if not client and client_model._is_sync_enabled():
+            _logger.warning("Digi client requested, but no client was configured.")
+        return client
+
+    def _get_digi_clients(self):
+        """Return all clients to send to, or nothing when syncing is disabled."""
+        if not self._get_digi_client():
+            return self.env["product_digi_sync.digi_client"]
+        return self.env["product_digi_sync.digi_client"]._get_sync_clients()
+
+    def _digi_fan_out(self, clients, kind):
+        """Send the records to all clients at once, retrying failures per client."""
+        failures = self.env["product_digi_sync.digi_client"]._send_to_clients(
+            clients, self, kind
+        )
+        unreachable = {}
+        for client, record, error in failures:
+            if classify_exception(error) != PAYLOAD:
+                # @Fresh is failing, not the record: the batch backs off as a whole
+                records, _error = unreachable.get(client, (self.browse(), None))
+                unreachable[client] = (records | record, error)
+                continue
+            _logger.warning(
+                "Sending %s %s to @Fresh client %s failed, retrying it separately: %s",
+                record._name,
+                record.id,
+                client.name,
+                error,
+            )
+            record._digi_send_as_job(kind, client)
+        for client, (records, error) in unreachable.items():
+            _logger.warning(
+                "Sending %s %s to @Fresh client %s failed, retrying them later: %s",
+                len(records),
+                self._name,
+                client.name,
+                error,
+            )
+            records._digi_with_delay(
+                kind, client, eta=client._get_retry_delay(error)
+            ).send_to_digi_directly(client=client)
+        return (
+            f"Sent {len(self)} {self._name} to {len(clients)} clients, "
+            f"{len(failures)} deliveries failed."
+        )
+
+    def _digi_use_outbox(self):
+        client = self.env["product_digi_sync.digi_client"]._get_configured_client()
+        return bool(client) and client.delivery_mode == "outbox"
+
+    def _filter_digi_changed(self, fingerprints, field_names):
+        """Return the records whose fingerprint differs from ``fingerprints``."""
+        if not fingerprints:
+            return self.browse()
+        new_fingerprints = self._get_digi_fingerprints(field_names)
+        return self.filtered(
+            lambda record: fingerprints.get(record.id) != new_fingerprints[record.id]
+        )
+
+    def _get_digi_fingerprints(self, field_names):
+        return {
+            values["id"]: ProductTransformer.fingerprint(values, field_names)
+            for values in self.read(field_names)
+        }
@@ -0,0 +1,95 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class Outbox(models.Model):
+    """Changes waiting to be sent to @Fresh in batch jobs, queued by a cron."""
+
+    _name = "product_digi_sync.outbox"
+    _description = "Digi Outbox"
+    _order = "id"
+
+    # Categories go first, so articles don't refer to unknown main groups.
+    KIND_ORDER = ("category", "article", "image")
+
+    res_model = fields.Char(required=True, index=True)
+    res_id = fields.Integer(required=True, index=True)
+    kind = fields.Selection(
+        [("article", "Article"), ("image", "Image"), ("category", "Category")],
+        required=True,
+    )
+    changed_at = fields.Datetime(
+        required=True, default=fields.Datetime.now, help="When the record last changed."
+    )
+
+    @api.model
+    def _add(self, records, kind):
+        """Record that the records changed, postponing their pending changes."""
+        pending = self.search(
+            [
+                ("res_model", "=", records._name),
+                ("res_id", "in", records.ids),
+                ("kind", "=", kind),
+            ]
+        )
+        pending.write({"changed_at": fields.Datetime.now()})
+        pending_ids = set(pending.mapped("res_id"))
+        return self.create(
+            [
+                {
+                    "res_model": records._name,
+                    "res_id": record.id,
+                    "kind": kind,
+                }
+                for record in records
+                if record.id not in pending_ids
+            ]
+        )
+
+    @api.model
+    def _cron_drain(self, limit=10000):
+        client_model = self.env["product_digi_sync.digi_client"]
+        clients = client_model._get_sync_clients()
+        if not clients:
+            if client_model._is_sync_enabled():
+                _logger.warning("Digi outbox not drained, no client was configured.")
+            return
+        # The settings of the configured client apply to the outbox
+        client = clients[0]
+        domain = []
+        if client.debounce_delay > 0:
+            settled_before = fields.Datetime.now() - timedelta(
+                seconds=client.debounce_delay
+            )
+            domain = [("changed_at", "<=", settled_before)]
+        rows = self.search(domain, limit=limit)
+        if not rows:
+            return
+        with client._measure_job("outbox"):
+            self._drain_rows(rows, client.get_batch_size())
+
+    @api.model
+    def _drain_rows(self, rows, batch_size):
+        """Replace the rows by batch jobs, sending the categories first."""
+        record_ids = defaultdict(set)
+        for row in rows:
+            record_ids[(row.res_model, row.kind)].add(row.res_id)
+        # The rows are removed when their jobs are queued: changes recorded
+        # after that get a new row, so they are not lost.
+        rows.unlink()
+
+        records_by_kind = {}
+        for res_model, kind in sorted(
+            record_ids, key=lambda key: self.KIND_ORDER.index(key[1])
+        ):
+            records = self.env[res_model].browse(sorted(record_ids[res_model, kind]))
+            records_by_kind[kind] = records.exists()
+        # The changes are settled already, so the jobs are not debounced again
+        self.env["product_digi_sync.digi_client"]._queue_batches(
+            records_by_kind, batch_size, eta=None
+        )
@@ -1,8 +1,13 @@
 from odoo import api, fields, models
+from odoo.tools import split_every
+
+from odoo.addons.queue_job.delay import chain, group
+
+from ..tools.product_transformer import ProductTransformer
 
 
 class ProductCategory(models.Model):
-    _inherit = "product.category"
+    _inherit = ["product.category", "product_digi_sync.sync_mixin"]
 
     barcode_rule_id = fields.Many2one("barcode.rule", string="Barcode Rule")
     external_digi_id = fields.Integer(
@@ -18,28 +23,92 @@ class ProductCategory(models.Model):
     ]
 
     def write(self, vals):
-        for record in self:
-            if record.external_digi_id:
-                record.send_to_digi()
+        category_fields = ProductTransformer.CATEGORY_FIELDS
+        fingerprints = (
+            self._get_digi_fingerprints(category_fields)
+            if set(vals).intersection(category_fields)
+            else {}
+        )
+
         result = super().write(vals)
+
+        changed = self._filter_digi_changed(fingerprints, category_fields).filtered(
+            "external_digi_id"
+        )
+        products = self.env["product.template"]
+        if changed and "external_digi_id" in vals:
+            # The articles refer to their category by its @Fresh id
+            products = products.search(
+                [("categ_id", "in", changed.ids), ("plu_code", ">", 0)]
+            )
+        changed.send_to_digi(products)
         return result
 
-    @api.model
-    def create(self, vals):
-        record = super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
 
-        if record.external_digi_id:
-            record.send_to_digi()
+        records.filtered("external_digi_id").send_to_digi()
 
-        return record
+        return records
 
-    def send_to_digi(self):
-        self.with_delay().send_to_digi_directly()
+    def send_to_digi(self, products=None):
+        """Send the categories, and then the products once they are all sent."""
+        if not self:
+            return
+        client = self._get_digi_client()
+        if not client:
+            return
+        if self._digi_use_outbox():
+            # The outbox sends categories before articles
+            self.env["product_digi_sync.outbox"]._add(self, "category")
+            if products:
+                self.env["product_digi_sync.outbox"]._add(products, "article")
+            return
+        batch_size = client.get_batch_size()
+        if not products:
+            categories = self._filter_digi_unqueued("category")
+            for batch in split_every(batch_size, categories.ids, categories.browse):
+                batch._digi_send_as_job("category")
+            return
+        chain(
+            group(
+                *[
+                    batch._digi_delayable("category").send_to_digi_directly()
+                    for batch in split_every(batch_size, self.ids, self.browse)
+                ]
+            ),
+            group(
+                *[
+                    batch._digi_delayable("article").send_to_digi_directly()
+                    for batch in split_every(batch_size, products.ids, products.browse)
+                ]
+            ),
+        ).delay()
 
-    def send_to_digi_directly(self):
-        digi_client_id = int(
-            self.env["ir.config_parameter"].get_param("digi_client_id")
-        )
-        client = self.env["product_digi_sync.digi_client"].browse(digi_client_id)
-        if client.exists():
-            client.send_category_to_digi(self)
+    def _digi_send_as_job(self, kind, client=None):
+        self._digi_with_delay("category", client).send_to_digi_directly(client=client)
+
+    def send_to_digi_directly(self, client=None):
+        # The clients are sent to one after the other, and a failure for any
+        # of them fails the job, as the articles waiting for it need the
+        # categories at every client.
+        categories = self.exists()
+        for digi_client in client or self._get_digi_clients():
+            client_categories = digi_client._filter_digi_records(categories)
+            if client_categories:
+                with digi_client._measure_job("category"):
+                    client_categories._send_to_digi_directly(digi_client)
+
+    def _send_to_digi_directly(self, client):
+        # Unlike articles, failed categories are not retried on their own: the
+        # job fails as a whole, so the articles waiting for it are not sent
+        # before their main group exists. Resending the rest is cheap.
+        error = None
+        for category in self:
+            try:
+                client.send_category_to_digi(category)
+            except Exception as e:
+                error = error or e
+        if error:
+            client._handle_job_exception(error)
@@ -1,106 +1,256 @@
 import logging
-import re
+from collections import defaultdict
 
 from odoo import api, fields, models
-from odoo.tools import get_barcode_check_digit
+from odoo.tools import split_every
 
-from odoo.addons.queue_job.exception import RetryableJobError
+from ..tools.barcode_pattern import BarcodePattern
+from ..tools.product_transformer import ProductTransformer
+from ..tools.retry_policy import PAYLOAD
+from .digi_client import classify_exception
 
 _logger = logging.getLogger(__name__)
 
 
 class ProductTemplate(models.Model):
-    _inherit = "product.template"
+    _inherit = ["product.template", "product_digi_sync.sync_mixin"]
 
     plu_code = fields.Integer(string="Plu code", required=False)
 
-    @api.depends("plu_code")
+    @api.depends(
+        "plu_code",
+        "categ_id.barcode_rule_id.pattern",
+        "categ_id.barcode_rule_id.encoding",
+        "product_variant_ids.barcode",
+    )
     def _compute_barcode(self):
+        ids_by_rule = defaultdict(list)
         for record in self:
             if record.plu_code and record.categ_id.barcode_rule_id:
-                pattern = record.categ_id.barcode_rule_id.pattern
-
-                is_ean = record.categ_id.barcode_rule_id.encoding == "ean13"
+                ids_by_rule[record.categ_id.barcode_rule_id].append(record.id)
+        # Products without a plu code or rule keep the barcode of their variant
+        with_plu_barcode = self.browse(
+            [record_id for ids in ids_by_rule.values() for record_id in ids]
+        )
+        result = super(ProductTemplate, self - with_plu_barcode)._compute_barcode()
 
-                record.barcode = record._prepare_barcode(
-                    pattern, record.plu_code, is_ean
-                )
+        # The pattern of each rule is parsed once, for all its products
+        for rule, ids in ids_by_rule.items():
+            records = self.browse(ids)
+            pattern = rule._get_barcode_pattern()
+            barcodes = pattern.get_barcodes(records.mapped("plu_code"))
+            for record, barcode in zip(records, barcodes, strict=True):
+                record.barcode = barcode
+        return result
 
     @staticmethod
     def _prepare_barcode(barcode_pattern, plu_code, is_ean13):
-        # Converting the code to a padded string
-        code_str = str(plu_code)
-        code_length = barcode_pattern.count(".")
-        padded_code = code_str.zfill(code_length)
-
-        # Building the dot pattern for regex search
-        dot_pattern = r"\.{" + str(code_length) + "}"
-
-        # Replacing the specific number of dots with the padded code
-        barcode = re.sub(dot_pattern, padded_code, barcode_pattern, count=1, flags=0)
-
-        # Replacing whatever is inside the {} brackets with zeros
-        repl_length = (
-            len(re.findall(r"{.*}", barcode_pattern)[0]) - 2
-        )  # subtract 2 for the {} brackets
-        zeros = "0" * repl_length
-        barcode = re.sub(r"{.*}", zeros, barcode, count=0, flags=0)
-        if is_ean13:
-            barcode_check_digit = get_barcode_check_digit(barcode + "0")
-            barcode = f"{barcode}{barcode_check_digit}"
-
-        return barcode
+        return BarcodePattern(barcode_pattern, is_ean13).get_barcode(plu_code)
 
     def write(self, vals):
+        # Nothing is sent while syncing is disabled, so nothing is compared
+        if not self._get_digi_client():
+            return super().write(vals)
+        article_fields = ProductTransformer.ARTICLE_FIELDS
+        image_fields = ProductTransformer.IMAGE_FIELDS
+        article_fingerprints = (
+            self._get_digi_fingerprints(article_fields)
+            if set(vals).intersection(article_fields)
+            else {}
+        )
+        image_fingerprints = (
+            self._get_digi_fingerprints(image_fields)
+            if set(vals).intersection(image_fields)
+            else {}
+        )
+
         result = super().write(vals)
-        for product_template in self:
-            if product_template.plu_code:
-                product_template.send_to_digi()
+
+        changed_articles = self._filter_digi_changed(
+            article_fingerprints, article_fields
+        )
+        changed_articles.filtered("plu_code").send_to_digi()
+        for product_template in self._filter_digi_changed(
+            image_fingerprints, image_fields
+        ):
             product_template.send_image_to_digi()
         return result
 
-    @api.model
-    def create(self, vals):
-        record = super().create(vals)
+    def _get_digi_fingerprints(self, field_names):
+        if "image_1920" not in field_names:
+            return super()._get_digi_fingerprints(field_names)
+        # The image is fingerprinted by the checksum of its attachment, instead
+        # of reading the whole image.
+        checksums = self._get_digi_image_checksums()
+        other_fields = [name for name in field_names if name != "image_1920"]
+        return {
+            values["id"]: ProductTransformer.fingerprint(
+                dict(values, image_1920=checksums.get(values["id"])), field_names
+            )
+            for values in self.read(other_fields)
+        }
 
-        if record.plu_code:
-            record.send_to_digi()
-        record.send_image_to_digi()
+    def _get_digi_image_checksums(self):
+        attachments = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", self._name),
+                    ("res_field", "=", "image_1920"),
+                    ("res_id", "in", self.ids),
+                ]
+            )
+        )
+        return {attachment.res_id: attachment.checksum for attachment in attachments}
 
-        return record
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
 
-    def send_to_digi(self):
-        self.ensure_one()
-        self.with_delay().send_to_digi_directly()
+        records.filtered("plu_code").send_to_digi()
+        for record in records:
+            record.send_image_to_digi()
+
+        return records
 
-    def send_to_digi_directly(self):
+    def send_to_digi(self):
+        if not self:
+            return
+        # No jobs are enqueued at all while syncing is disabled
         client = self._get_digi_client()
-        if client:
+        if not client:
+            return
+        if self._digi_use_outbox():
+            self.env["product_digi_sync.outbox"]._add(self, "article")
+            return
+        # Articles wait for their main group when a client may not know it yet,
+        # like a new category whose job is still pending.
+        categories = self._get_digi_unsent_categories()
+        waiting = self.filtered(lambda product: product.categ_id in categories)
+        if waiting:
+            categories.send_to_digi(waiting)
+        # Products already in a pending job are sent by it
+        products = (self - waiting)._filter_digi_unqueued("article")
+        if not products:
+            return
+        if len(products) == 1:
+            products._digi_send_as_job("article")
+            return
+        batch_size = client.get_batch_size()
+        for batch in split_every(batch_size, products.ids, products.browse):
+            batch._digi_with_delay("article").send_to_digi_directly()
+
+    def _get_digi_unsent_categories(self):
+        categories = self.categ_id.filtered("external_digi_id")
+        unsent = categories.browse()
+        if not categories:
+            return unsent
+        sync_state = self.env["product_digi_sync.sync_state"]
+        for client in self._get_digi_clients():
+            unsent |= sync_state._filter_unsent(
+                client, client._filter_digi_records(categories), "category"
+            )
+        return unsent
+
+    def send_to_digi_directly(self, client=None):
+        clients = client or self._get_digi_clients()
+        if len(clients) > 1:
+            return self._digi_fan_out(clients, "article")
+        # Products deleted while the job was queued are left out
+        products = self.exists()
+        if clients:
+            products = clients._filter_digi_records(products)
+        if not clients or not products:
+            return
+        with clients._measure_job("article"):
+            return products._send_to_digi_directly(clients)
+
+    def _send_to_digi_directly(self, client):
+        if len(self) == 1:
             try:
                 client.send_product_to_digi(self)
             except Exception as e:
-                raise RetryableJobError(str(e), 5) from e
+                client._handle_job_exception(e)
+            return
+
+        try:
+            failures = client.send_products_to_digi(self)
+        except Exception as e:
+            # @Fresh is failing, not the products: the whole batch backs off
+            client._handle_job_exception(e)
+        for product, error in failures:
+            _logger.warning(
+                "Sending product %s to @Fresh failed, retrying it separately: %s",
+                product.id,
+                error,
+            )
+            # Retry the failed products one by one, so they get their own
+            # retry schedule without resending the rest of the batch.
+            product._digi_send_as_job("article", client)
+        return f"Sent {len(self) - len(failures)} of {len(self)} products to @Fresh."
 
-    def send_image_to_digi(self):
+    def send_image_to_digi(self, force=False):
         self.ensure_one()
-        if not self.image_1920:
+        if not self.image_1920 or not self._get_digi_client():
             return
-        self.with_delay().send_image_to_digi_directly()
+        if not force and self._digi_use_outbox():
+            self.env["product_digi_sync.outbox"]._add(self, "image")
+            return
+        if not force and not self._filter_digi_unqueued("image"):
+            return
+        self._digi_with_delay("image").send_image_to_digi_directly(force=force)
 
-    def send_image_to_digi_directly(self):
-        client = self._get_digi_client()
-        if client:
+    def _digi_send_as_job(self, kind, client=None):
+        if kind == "image":
+            self._digi_with_delay("image", client).send_image_to_digi_directly(
+                client=client
+            )
+        else:
+            self._digi_with_delay("article", client).send_to_digi_directly(
+                client=client
+            )
+
+    def send_image_to_digi_directly(self, force=False, client=None):
+        clients = client or self._get_digi_clients()
+        # Products deleted or without image by the time the job runs are left out
+        products = self.exists().filtered("image_1920")
+        for image_client in clients:
+            client_products = image_client._filter_digi_records(products)
+            if not client_products:
+                continue
+            with image_client._measure_job("image"):
+                client_products._send_images_to_digi_directly(
+                    image_client, force, fan_out=len(clients) > 1
+                )
+
+    def _send_images_to_digi_directly(self, client, force, fan_out):
+        for index, product in enumerate(self):
             try:
-                client.send_product_image_to_digi(self)
+                client.send_product_image_to_digi(product, force=force)
             except Exception as e:
-                raise RetryableJobError(str(e), 5) from e
-
-    def _get_digi_client(self):
-        digi_client_id = int(
-            self.env["ir.config_parameter"].get_param("digi_client_id")
-        )
-        client = self.env["product_digi_sync.digi_client"].browse(digi_client_id)
-        if not client.exists():
-            _logger.warning("Digi client requested, but no client was configured.")
-            return False
-        return client
+                rejected = classify_exception(e) == PAYLOAD
+                if not fan_out and not (rejected and len(self) > 1):
+                    client._handle_job_exception(e)
+                if rejected:
+                    _logger.warning(
+                        "Sending image of %s to @Fresh client %s failed, retrying "
+                        "it separately: %s",
+                        product.id,
+                        client.name,
+                        e,
+                    )
+                    product._digi_send_as_job("image", client)
+                    continue
+                # @Fresh is failing: the remaining images of this client back off,
+                # the other clients got theirs.
+                _logger.warning(
+                    "Sending images to @Fresh client %s failed, retrying them "
+                    "later: %s",
+                    client.name,
+                    e,
+                )
+                self[index:]._digi_with_delay(
+                    "image", client, eta=client._get_retry_delay(e)
+                ).send_image_to_digi_directly(force=force, client=client)
+                return
@@ -0,0 +1,144 @@
+import json
+from collections import defaultdict
+
+from odoo import api, fields, models
+
+from ..tools.sync_metrics import LATENCY_BUCKETS, StageStats, get_percentile
+
+
+class SyncStatValues(models.AbstractModel):
+    _name = "product_digi_sync.sync_stat_values"
+    _description = "Digi Sync Statistics Values"
+
+    client_id = fields.Many2one(
+        "product_digi_sync.digi_client", required=True, ondelete="cascade"
+    )
+    stage = fields.Char(required=True)
+    endpoint = fields.Char()
+    count = fields.Integer()
+    failure_count = fields.Integer()
+    retry_count = fields.Integer()
+    total_duration = fields.Float(help="Total duration in seconds.")
+    max_duration = fields.Float(help="Longest duration in seconds.")
+    # A float, as the total size of the payloads quickly exceeds an integer.
+    payload_bytes = fields.Float(digits=(16, 0))
+    histogram = fields.Char(
+        help="Number of durations per bucket, as a JSON list. The bucket bounds "
+        f"are {', '.join(str(bound) for bound in LATENCY_BUCKETS)} seconds, "
+        "and above.",
+    )
+
+    def _get_buckets(self):
+        self.ensure_one()
+        return json.loads(self.histogram) if self.histogram else []
+
+    def _get_stage_stats(self):
+        self.ensure_one()
+        stats = StageStats()
+        stats.count = self.count
+        stats.failure_count = self.failure_count
+        stats.retry_count = self.retry_count
+        stats.total_duration = self.total_duration
+        stats.max_duration = self.max_duration
+        stats.payload_bytes = self.payload_bytes
+        stats.buckets = self._get_buckets() or stats.buckets
+        return stats
+
+    @api.model
+    def _get_values(self, stats):
+        return {
+            "count": stats.count,
+            "failure_count": stats.failure_count,
+            "retry_count": stats.retry_count,
+            "total_duration": stats.total_duration,
+            "max_duration": stats.max_duration,
+            "payload_bytes": stats.payload_bytes,
+            "histogram": json.dumps(stats.buckets),
+        }
+
+
+class SyncStat(models.Model):
+    """Timings and counters of one stage of the sync, summed over all workers."""
+
+    _name = "product_digi_sync.sync_stat"
+    _inherit = "product_digi_sync.sync_stat_values"
+    _description = "Digi Sync Statistics"
+    _order = "stage, endpoint"
+
+    average_duration = fields.Float(
+        compute="_compute_durations", help="Average duration in seconds."
+    )
+    p95_duration = fields.Float(
+        compute="_compute_durations",
+        help="95th percentile of the duration in seconds, estimated from the "
+        "histogram.",
+    )
+
+    _sql_constraints = [
+        (
+            "stage_endpoint_unique",
+            "unique(client_id, stage, endpoint)",
+            "There can only be one statistic per client, stage and endpoint.",
+        ),
+    ]
+
+    @api.depends("count", "total_duration", "max_duration", "histogram")
+    def _compute_durations(self):
+        for stat in self:
+            stat.average_duration = (
+                stat.total_duration / stat.count if stat.count else 0.0
+            )
+            p95 = get_percentile(stat._get_buckets(), 95)
+            stat.p95_duration = stat.max_duration if p95 is None else p95
+
+    @api.model
+    def _cron_add_samples(self):
+        """Add the samples stored by the jobs to the statistics."""
+        samples = self.env["product_digi_sync.sync_stat_sample"].search([])
+        totals = defaultdict(StageStats)
+        for sample in samples:
+            key = (sample.client_id, sample.stage, sample.endpoint or "")
+            totals[key].merge(sample._get_stage_stats())
+        existing = {
+            (stat.client_id, stat.stage, stat.endpoint or ""): stat
+            for stat in self.search([("client_id", "in", samples.client_id.ids)])
+        }
+        for key, stats in totals.items():
+            stat = existing.get(key)
+            if stat:
+                stats.merge(stat._get_stage_stats())
+                stat.write(self._get_values(stats))
+            else:
+                client, stage, endpoint = key
+                self.create(
+                    dict(
+                        self._get_values(stats),
+                        client_id=client.id,
+                        stage=stage,
+                        endpoint=endpoint,
+                    )
+                )
+        samples.unlink()
+
+
+class SyncStatSample(models.Model):
+    """Timings and counters measured by one job, until the cron adds them up."""
+
+    # Jobs only insert samples, so they don't wait on each other's row locks.
+    _name = "product_digi_sync.sync_stat_sample"
+    _inherit = "product_digi_sync.sync_stat_values"
+    _description = "Digi Sync Statistics Sample"
+
+    @api.model
+    def _add_samples(self, client, popped):
+        self.create(
+            [
+                dict(
+                    self._get_values(stats),
+                    client_id=client.id,
+                    stage=stage,
+                    endpoint=endpoint,
+                )
+                for (stage, endpoint), stats in popped.items()
+            ]
+        )
@@ -0,0 +1,229 @@
+import hashlib
+from collections import defaultdict
+
+from psycopg2 import sql
+
+from odoo import api, fields, models
+
+
+class SyncState(models.Model):
+    """What was last sent to a client, per record and kind of payload."""
+
+    _name = "product_digi_sync.sync_state"
+    _description = "Digi Sync State"
+
+    # The records that can be resynced, per kind: their model and the SQL
+    # condition on the record (aliased ``r``) for it to be sent at all.
+    RESYNC_TARGETS = {
+        "category": ("product.category", "r.external_digi_id > 0"),
+        "article": ("product.template", "r.plu_code > 0"),
+        "image": (
+            "product.template",
+            "r.plu_code > 0 AND EXISTS (SELECT 1 FROM ir_attachment a "
+            "WHERE a.res_model = 'product.template' "
+            "AND a.res_field = 'image_1920' AND a.res_id = r.id)",
+        ),
+    }
+
+    client_id = fields.Many2one(
+        "product_digi_sync.digi_client", required=True, ondelete="cascade"
+    )
+    res_model = fields.Char(required=True)
+    res_id = fields.Integer(required=True)
+    kind = fields.Selection(
+        [("article", "Article"), ("image", "Image"), ("category", "Category")],
+        required=True,
+    )
+    payload_hash = fields.Char(help="Hash of what was last sent to @Fresh.")
+    status = fields.Selection(
+        [("sent", "Sent"), ("failed", "Failed")],
+        help="Whether the last delivery to the client succeeded.",
+    )
+    last_error = fields.Text()
+    synced_at = fields.Datetime(help="When the record was last sent to the client.")
+
+    _sql_constraints = [
+        (
+            "record_kind_unique",
+            "unique(client_id, res_model, res_id, kind)",
+            "There can only be one sync state per client, record and kind.",
+        ),
+    ]
+
+    @api.model
+    def _get_payload_hash(self, client, record, kind):
+        return self._find(client, record, kind).payload_hash
+
+    @api.model
+    def _set_payload_hash(self, client, record, kind, payload_hash):
+        state = self._find(client, record, kind)
+        if state:
+            state.write(
+                {"payload_hash": payload_hash, "synced_at": fields.Datetime.now()}
+            )
+        else:
+            self.create(
+                {
+                    "client_id": client.id,
+                    "res_model": record._name,
+                    "res_id": record.id,
+                    "kind": kind,
+                    "payload_hash": payload_hash,
+                    "synced_at": fields.Datetime.now(),
+                }
+            )
+
+    @staticmethod
+    def _hash_payload(body):
+        return hashlib.sha1(body.encode()).hexdigest()
+
+    @api.model
+    def _record_deliveries(self, client, records, kind, errors, payloads=None):
+        """Store the result of sending the records, an error or None each."""
+        states = {
+            state.res_id: state
+            for state in self.search(
+                [
+                    ("client_id", "=", client.id),
+                    ("res_model", "=", records._name),
+                    ("res_id", "in", records.ids),
+                    ("kind", "=", kind),
+                ]
+            )
+        }
+        # Existing states are written per outcome and their hashes in a single
+        # query, new states are created at once.
+        ids_by_outcome = defaultdict(list)
+        hashes = {}
+        new_states = []
+        synced_at = fields.Datetime.now()
+        payloads = payloads or [None] * len(records)
+        for record, error, body in zip(records, errors, payloads, strict=True):
+            values = {
+                "status": "failed" if error else "sent",
+                "last_error": str(error) if error else False,
+                "synced_at": synced_at,
+            }
+            payload_hash = (
+                self._hash_payload(body) if body is not None and not error else None
+            )
+            state = states.get(record.id)
+            if state:
+                ids_by_outcome[tuple(values.items())].append(state.id)
+                if payload_hash:
+                    hashes[state.id] = payload_hash
+                continue
+            values.update(
+                {
+                    "client_id": client.id,
+                    "res_model": records._name,
+                    "res_id": record.id,
+                    "kind": kind,
+                }
+            )
+            if payload_hash:
+                values["payload_hash"] = payload_hash
+            new_states.append(values)
+        for values, state_ids in ids_by_outcome.items():
+            self.browse(state_ids).write(dict(values))
+        self._write_payload_hashes(hashes)
+        self.create(new_states)
+
+    @api.model
+    def _write_payload_hashes(self, hashes):
+        """Store the payload hash of every state id, in a single query."""
+        if not hashes:
+            return
+        self.flush_model(["payload_hash"])
+        query = sql.SQL(
+            """
+            UPDATE {table} s
+            SET payload_hash = v.payload_hash
+            FROM unnest(%s::int[], %s::varchar[]) AS v(id, payload_hash)
+            WHERE s.id = v.id
+            """
+        ).format(table=sql.Identifier(self._table))
+        self.env.cr.execute(query, (list(hashes), list(hashes.values())))
+        self.invalidate_model(["payload_hash"])
+
+    @api.model
+    def _get_stale_record_ids(self, client, kind):
+        """Return the ids of the records the client may not be up to date with."""
+        model_name, condition = self.RESYNC_TARGETS[kind]
+        records = self.env[model_name]
+        records.flush_model(["write_date"])
+        self.flush_model()
+        query = sql.SQL(
+            """
+            SELECT r.id
+            FROM {table} r
+            LEFT JOIN product_digi_sync_sync_state s
+                ON s.client_id = %s
+                AND s.res_model = %s
+                AND s.res_id = r.id
+                AND s.kind = %s
+            WHERE {condition}
+                AND (
+                    s.id IS NULL
+                    OR s.status IS DISTINCT FROM 'sent'
+                    OR r.write_date > s.synced_at
+                )
+            ORDER BY r.id
+            """
+        ).format(table=sql.Identifier(records._table), condition=sql.SQL(condition))
+        self.env.cr.execute(query, (client.id, model_name, kind))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _filter_changed(self, client, records, kind, payloads):
+        """Return the records whose payload changed, and mark the others synced."""
+        states = {
+            state.res_id: state
+            for state in self.search(
+                [
+                    ("client_id", "=", client.id),
+                    ("res_model", "=", records._name),
+                    ("res_id", "in", records.ids),
+                    ("kind", "=", kind),
+                    ("status", "=", "sent"),
+                ]
+            )
+        }
+        changed_ids = []
+        unchanged = self.browse()
+        for record, body in zip(records, payloads, strict=True):
+            state = states.get(record.id)
+            if state and state.payload_hash == self._hash_payload(body):
+                unchanged |= state
+            else:
+                changed_ids.append(record.id)
+        unchanged.write({"synced_at": fields.Datetime.now()})
+        return records.browse(changed_ids)
+
+    @api.model
+    def _filter_unsent(self, client, records, kind):
+        """Return the records that were not delivered to the client."""
+        sent_ids = set(
+            self.search(
+                [
+                    ("client_id", "=", client.id),
+                    ("res_model", "=", records._name),
+                    ("res_id", "in", records.ids),
+                    ("kind", "=", kind),
+                    ("status", "=", "sent"),
+                ]
+            ).mapped("res_id")
+        )
+        return records.filtered(lambda record: record.id not in sent_ids)
+
+    @api.model
+    def _find(self, client, record, kind):
+        return self.search(
+            [
+                ("client_id", "=", client.id),
+                ("res_model", "=", record._name),
+                ("res_id", "=", record.id),
+                ("kind", "=", kind),
+            ],
+            limit=1,
+        )
@@ -3,4 +3,14 @@ from . import (
     test_digi_client,
     test_product_template,
     test_product_category,
+    test_image_preparer,
+    test_product_transformer,
+    test_rate_limiter,
+    test_outbox,
+    test_sync_metrics,
+    test_benchmark,
+    test_fake_fresh_server,
+    test_fan_out,
+    test_incremental_resync,
+    test_reconcile,
 )
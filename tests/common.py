@@ -0,0 +1,33 @@
+from odoo.tests import TransactionCase
+
+from odoo.addons.product_digi_sync.tools.fake_fresh_server import FakeFreshServer
+
+
+class FakeFreshTestCase(TransactionCase):
+    """Sync a client with the fake @Fresh server."""
+
+    # Keyword arguments of the FakeFreshServer
+    server_options = {}
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeFreshServer(**self.server_options).start()
+        self.addCleanup(self.server.stop)
+        self.digi_client = self.env["product_digi_sync.digi_client"].create(
+            {
+                "name": "Fake",
+                "username": "user",
+                "password": "<PASSWORD>",
+                "api_url": self.server.url,
+            }
+        )
+        self.addCleanup(self.digi_client._discard_sessions)
+
+    def _route_only(self, products, categories):
+        # Leave the records of other tests and demo data out of the sync
+        self.digi_client.write(
+            {
+                "product_domain": f"[('id', 'in', {products.ids})]",
+                "category_domain": f"[('id', 'in', {categories.ids})]",
+            }
+        )
@@ -0,0 +1,200 @@
+"""Benchmarks of the hot paths of the @Fresh sync.
+
+They are not part of the standard test run. Run them with
+``--test-tags digi_benchmark``. Requests go to a local fake @Fresh server,
+which answers after ``DIGI_BENCHMARK_LATENCY`` seconds (default 0).
+
+The results are written as JSON to the file in the ``DIGI_BENCHMARK_OUTPUT``
+environment variable, and logged. To catch regressions, pass the results of
+an earlier run in ``DIGI_BENCHMARK_BASELINE``: a benchmark then fails when it
+is more than ``DIGI_BENCHMARK_TOLERANCE`` (default 0.25) slower than its
+baseline. ``DIGI_BENCHMARK_SIZES`` sets the numbers of products of the
+end-to-end benchmarks (default 1000,10000,50000).
+"""
+import base64
+import io
+import json
+import logging
+import os
+import platform
+import time
+
+from PIL import Image
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.product_digi_sync.tools.fake_fresh_server import FakeFreshServer
+from odoo.addons.product_digi_sync.tools.product_transformer import (
+    ProductTransformer,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "digi_benchmark")
+class BenchmarkTestCase(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = []
+        cls.baseline = cls._load_baseline()
+        latency = float(os.environ.get("DIGI_BENCHMARK_LATENCY", "0"))
+        cls.server = FakeFreshServer(latency=latency).start()
+        cls.digi_client = cls.env["product_digi_sync.digi_client"].create(
+            {
+                "name": "Benchmark",
+                "username": "benchmark",
+                "password": "benchmark",
+                "api_url": cls.server.url,
+            }
+        )
+        cls.barcode_rule = cls.env["barcode.rule"].create(
+            {
+                "name": "Benchmark barcode",
+                "encoding": "ean13",
+                "type": "price",
+                "pattern": "27.....{NNNDD}",
+                "digi_barcode_type_id": 42,
+            }
+        )
+        cls.category = cls.env["product.category"].create(
+            {"name": "Benchmark category", "barcode_rule_id": cls.barcode_rule.id}
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls._write_results()
+        super().tearDownClass()
+
+    def test_transform_product_to_payload(self):
+        product = self._create_products(1)
+        self._measure(
+            "transform_product_to_payload",
+            1000,
+            lambda: ProductTransformer.transform_product_to_payload(product),
+        )
+
+    def test_transform_product_to_image_payload(self):
+        for size in (64, 512, 2048):
+            product = self._create_products(1)
+            product.image_1920 = self._create_image(size)
+            self._measure(
+                f"transform_product_to_image_payload_{size}px",
+                20,
+                lambda product=product: (
+                    ProductTransformer.transform_product_to_image_payload(product)
+                ),
+            )
+
+    def test_prepare_barcode(self):
+        prepare_barcode = self.env["product.template"]._prepare_barcode
+        self._measure(
+            "prepare_barcode",
+            10000,
+            lambda: prepare_barcode("27.....{NNNDD}", 12345, True),
+        )
+
+    def test_sync_jobs_throughput(self):
+        config = self.env["ir.config_parameter"]
+        config.set_param("digi_sync_products_enabled", True)
+        sizes = os.environ.get("DIGI_BENCHMARK_SIZES", "1000,10000,50000")
+        for size in [int(size) for size in sizes.split(",")]:
+            products = self._create_products(size)
+            self.env.flush_all()
+            self.env.invalidate_all()
+            config.set_param("digi_client_id", self.digi_client.id)
+            self._measure(
+                f"sync_jobs_{size}_products",
+                size,
+                # Run the jobs right away instead of enqueueing them
+                products.with_context(queue_job__no_delay=True).send_to_digi,
+                repeat=1,
+            )
+            config.set_param("digi_client_id", False)
+
+    def _measure(self, name, count, function, repeat=3):
+        """Time ``count`` operations, keeping the best of ``repeat`` rounds."""
+        calls = count if repeat > 1 else 1
+        timings = []
+        for _round in range(repeat):
+            started_at = time.perf_counter()
+            for _call in range(calls):
+                function()
+            timings.append(time.perf_counter() - started_at)
+        seconds = min(timings)
+        result = {
+            "name": name,
+            "count": count,
+            "seconds": seconds,
+            "per_second": count / seconds if seconds else None,
+        }
+        self.results.append(result)
+        _logger.info("Benchmark %s: %s", name, json.dumps(result))
+
+        baseline = self.baseline.get(name)
+        if baseline and baseline["per_second"] and result["per_second"]:
+            tolerance = float(os.environ.get("DIGI_BENCHMARK_TOLERANCE", "0.25"))
+            self.assertGreaterEqual(
+                result["per_second"],
+                baseline["per_second"] * (1 - tolerance),
+                f"{name} regressed: {result['per_second']:.1f}/s, "
+                f"baseline {baseline['per_second']:.1f}/s",
+            )
+
+    @classmethod
+    def _load_baseline(cls):
+        path = os.environ.get("DIGI_BENCHMARK_BASELINE")
+        if not path:
+            return {}
+        with open(path) as baseline_file:
+            return {
+                result["name"]: result for result in json.load(baseline_file)["results"]
+            }
+
+    @classmethod
+    def _write_results(cls):
+        path = os.environ.get("DIGI_BENCHMARK_OUTPUT")
+        if not path:
+            return
+        with open(path, "w") as output_file:
+            json.dump(
+                {
+                    "created_at": fields.Datetime.to_string(fields.Datetime.now()),
+                    "python": platform.python_version(),
+                    "results": cls.results,
+                },
+                output_file,
+                indent=2,
+            )
+
+    def _create_products(self, count):
+        plu_offset = self.env["product.template"].search_count([]) * 10
+        # Without a configured client, the jobs of the created products do
+        # nothing, so running them right away is cheapest.
+        products = (
+            self.env["product.template"]
+            .with_context(queue_job__no_delay=True, tracking_disable=True)
+            .create(
+                [
+                    {
+                        "name": f"Benchmark product {index}",
+                        "plu_code": plu_offset + index + 1,
+                        "list_price": 2.5,
+                        "standard_price": 1.5,
+                        "categ_id": self.category.id,
+                    }
+                    for index in range(count)
+                ]
+            )
+        )
+        return self.env["product.template"].browse(products.ids)
+
+    @staticmethod
+    def _create_image(size):
+        # Noise doesn't compress, like photos of products.
+        image = Image.effect_noise((size, size), 64).convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        return base64.b64encode(output.getvalue())
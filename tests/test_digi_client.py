@@ -1,7 +1,10 @@
+import asyncio
 import base64
 import contextlib
 import io
 import json
+import os
+import unittest
 from json import JSONDecodeError
 from unittest.mock import patch
 
@@ -10,7 +13,17 @@ from PIL import Image
 
 from odoo.tests import TransactionCase, tagged
 
-from odoo.addons.product_digi_sync.models.digi_client import DigiApiException
+from odoo.addons.product_digi_sync.models.digi_client import (
+    DigiApiException,
+    DigiClient,
+)
+from odoo.addons.product_digi_sync.tools.async_sender import AsyncSender, httpx
+from odoo.addons.product_digi_sync.tools.json_stream import JsonStream
+from odoo.addons.product_digi_sync.tools.product_transformer import (
+    ProductTransformer,
+)
+from odoo.addons.product_digi_sync.tools.retry_policy import RetryPolicy
+from odoo.addons.queue_job.exception import FailedJobError, RetryableJobError
 
 
 class DigiClientTestCase(TransactionCase):
@@ -41,8 +54,12 @@ class DigiClientTestCase(TransactionCase):
 
             self.digi_client.send_product_to_digi(product)
 
+            session_headers = self.digi_client._get_session().headers
             self.assertEqual(post_spy.call_args.kwargs["url"], expected_url)
-            self.assertEqual(post_spy.call_args.kwargs["headers"], expected_headers)
+            self.assertEqual(
+                {key: session_headers[key] for key in expected_headers},
+                expected_headers,
+            )
 
     @tagged("post_install", "-at_install")
     def test_it_sends_a_product_to_digi_with_the_right_payload(self):
@@ -388,6 +405,96 @@ class DigiClientTestCase(TransactionCase):
 
             self.assertEqual(post_spy.call_args.kwargs["data"], expected_payload)
 
+    def test_it_skips_uploading_an_image_that_was_already_sent(self):
+        with self.patch_request_post() as post_spy:
+            product_with_image = self._create_product_with_image("product", 200)
+
+            self.assertTrue(
+                self.digi_client.send_product_image_to_digi(product_with_image)
+            )
+            self.assertFalse(
+                self.digi_client.send_product_image_to_digi(product_with_image)
+            )
+            self.assertEqual(post_spy.call_count, 1)
+
+            self.assertTrue(
+                self.digi_client.send_product_image_to_digi(
+                    product_with_image, force=True
+                )
+            )
+            self.assertEqual(post_spy.call_count, 2)
+
+    def test_it_uploads_the_image_again_when_it_changed(self):
+        with self.patch_request_post() as post_spy:
+            product_with_image = self._create_product_with_image("product", 200)
+            self.digi_client.send_product_image_to_digi(product_with_image)
+
+            image = Image.new("RGB", (2, 2))
+            output = io.BytesIO()
+            image.save(output, format="PNG")
+            product_with_image.image_1920 = base64.b64encode(output.getvalue())
+
+            self.assertTrue(
+                self.digi_client.send_product_image_to_digi(product_with_image)
+            )
+            self.assertEqual(post_spy.call_count, 2)
+
+    def test_it_uploads_the_image_again_when_the_product_was_renamed(self):
+        with self.patch_request_post() as post_spy:
+            product_with_image = self._create_product_with_image("product", 200)
+            self.digi_client.send_product_image_to_digi(product_with_image)
+
+            product_with_image.name = "renamed product"
+
+            self.assertTrue(
+                self.digi_client.send_product_image_to_digi(product_with_image)
+            )
+            self.assertEqual(post_spy.call_count, 2)
+
+    def test_it_downscales_and_reencodes_images_when_configured(self):
+        self.digi_client.write(
+            {"image_max_size": 10, "image_format": "jpeg", "image_quality": 80}
+        )
+        product_with_image = self.env["product.template"].create(
+            {"name": "product Name", "plu_code": 200}
+        )
+        image = Image.new("RGB", (100, 50))
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        product_with_image.image_1920 = base64.b64encode(output.getvalue())
+
+        with self.patch_request_post() as post_spy:
+            self.digi_client.send_product_image_to_digi(product_with_image)
+
+            payload = json.loads(post_spy.call_args.kwargs["data"])
+            sent_image = Image.open(
+                io.BytesIO(base64.b64decode(payload["OriginalInput"]))
+            )
+            self.assertEqual(payload["InputFormat"], "jpg")
+            self.assertEqual(sent_image.format, "JPEG")
+            self.assertEqual(sent_image.size, (10, 5))
+
+    def test_it_streams_large_images_with_the_same_payload(self):
+        product_with_image = self.env["product.template"].create(
+            {"name": "product Name", "plu_code": 200}
+        )
+        # Random pixels don't compress, so the PNG is well over the threshold.
+        image = Image.frombytes("RGB", (400, 400), os.urandom(400 * 400 * 3))
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        product_with_image.image_1920 = base64.b64encode(output.getvalue())
+        expected_payload = ProductTransformer.transform_product_to_image_payload(
+            product_with_image
+        )
+
+        with self.patch_request_post() as post_spy:
+            self.digi_client.send_product_image_to_digi(product_with_image)
+
+            body = post_spy.call_args.kwargs["data"]
+            self.assertIsInstance(body, JsonStream)
+            self.assertEqual(len(body), len(expected_payload))
+            self.assertEqual(b"".join(body).decode("utf-8"), expected_payload)
+
     def test_it_sends_a_product_category_to_digi_with_the_right_url(self):
         category_name = "Test category"
         digi_id = 2
@@ -433,6 +540,353 @@ class DigiClientTestCase(TransactionCase):
 
             self.assertEqual(post_spy.call_args.kwargs["data"], expected_payload)
 
+    def test_it_sends_a_batch_of_products_over_the_pooled_session(self):
+        products = self.env["product.product"].create(
+            [
+                {"name": "Test product 1", "plu_code": 201},
+                {"name": "Test product 2", "plu_code": 202},
+            ]
+        )
+
+        with self.patch_request_post() as post_spy:
+            failures = self.digi_client.send_products_to_digi(products)
+
+            self.assertEqual(failures, [])
+            sent_plu_codes = [
+                json.loads(call.kwargs["data"])["DataId"]
+                for call in post_spy.call_args_list
+            ]
+            self.assertEqual(sent_plu_codes, [201, 202])
+
+    def test_it_reuses_the_session_until_the_client_changes(self):
+        session = self.digi_client._get_session()
+
+        self.assertIs(self.digi_client._get_session(), session)
+
+        self.digi_client.write({"password": "456", "pool_size": 8})
+        new_session = self.digi_client._get_session()
+
+        self.assertIsNot(new_session, session)
+        self.assertEqual(
+            new_session.headers["ApplicationLogIn"],
+            json.dumps({"User": "test_username", "Password": "456"}),
+        )
+        self.assertEqual(new_session.get_adapter("https://")._pool_maxsize, 8)
+
+    def test_it_skips_products_deleted_before_the_batch_was_sent(self):
+        products = self.env["product.template"].create(
+            [
+                {"name": "Test product 1", "plu_code": 211},
+                {"name": "Test product 2", "plu_code": 212},
+                {"name": "Test product 3", "plu_code": 213},
+            ]
+        )
+        products[1].unlink()
+
+        with self.patch_request_post() as post_spy:
+            failures = self.digi_client.send_products_to_digi(products)
+
+            self.assertEqual(failures, [])
+            sent_plu_codes = [
+                json.loads(call.kwargs["data"])["DataId"]
+                for call in post_spy.call_args_list
+            ]
+            self.assertEqual(sent_plu_codes, [211, 213])
+        sync_state = self.env["product_digi_sync.sync_state"]
+        self.assertEqual(
+            sync_state._find(self.digi_client, products[2], "article").payload_hash,
+            sync_state._hash_payload(
+                ProductTransformer.transform_product_to_payload(products[2])
+            ),
+        )
+
+    def test_it_stops_a_batch_when_fresh_cant_be_reached(self):
+        products = self.env["product.template"].create(
+            [
+                {"name": "Test product 1", "plu_code": 221},
+                {"name": "Test product 2", "plu_code": 222},
+            ]
+        )
+
+        with self.patch_request_post() as post_spy:
+            post_spy.side_effect = requests.ConnectionError("Connection refused")
+            with self.assertRaises(RetryableJobError):
+                products._send_to_digi_directly(self.digi_client)
+
+            self.assertEqual(post_spy.call_count, 1)
+        self.assertEqual(
+            self.env["product_digi_sync.sync_state"]
+            ._find(self.digi_client, products[0], "article")
+            .status,
+            "failed",
+        )
+
+    def test_it_reports_failures_per_product_in_a_batch(self):
+        products = self.env["product.product"].create(
+            [
+                {"name": "Test product 1", "plu_code": 201},
+                {"name": "Test product 2", "plu_code": 202},
+            ]
+        )
+        failed_response = requests.Response()
+        failed_response.status_code = 200
+        failed_response._content = json.dumps(
+            {"Result": -2, "ResultDescription": "Validation failed"}
+        ).encode("utf-8")
+
+        with self.patch_request_post() as post_spy:
+            post_spy.side_effect = [failed_response, post_spy.return_value]
+            failures = self.digi_client.send_products_to_digi(products)
+
+            self.assertEqual(post_spy.call_count, 2)
+            self.assertEqual(failures, [(products[0], "Error -2: Validation failed")])
+
+    def test_it_syncs_all_categories_before_all_products(self):
+        categories = self.env["product.category"].create(
+            [
+                {"name": "Test category 1", "external_digi_id": 501},
+                {"name": "Test category 2", "external_digi_id": 502},
+            ]
+        )
+        products = self.env["product.template"].create(
+            [
+                {"name": "Test product 1", "plu_code": 601},
+                {"name": "Test product 2", "plu_code": 602},
+                {"name": "Test product 3", "plu_code": 603},
+            ]
+        )
+        self.digi_client.write({"batch_size": 2, "full_sync_concurrency": 2})
+
+        with self.patch_request_post() as post_spy:
+            self.digi_client.with_context(queue_job__no_delay=True).full_sync()
+
+            sent = [
+                (call.kwargs["url"].split("/")[-2], json.loads(call.kwargs["data"]))
+                for call in post_spy.call_args_list
+            ]
+
+        self.assertEqual(
+            [endpoint for endpoint, _payload in sent],
+            ["MAINGROUP.SVC"] * 2 + ["ARTICLE.SVC"] * 3,
+        )
+        self.assertEqual(
+            sorted(payload["DataId"] for _endpoint, payload in sent),
+            [501, 502, 601, 602, 603],
+        )
+        self.assertEqual(self.digi_client.full_sync_state, "done")
+        self.assertEqual(self.digi_client.full_sync_sent_count, 5)
+        self.assertEqual(
+            self.digi_client.full_sync_category_checkpoint, categories[-1].id
+        )
+        self.assertEqual(self.digi_client.full_sync_product_checkpoint, products[-1].id)
+        self.assertTrue(self.digi_client.full_sync_summary)
+
+    def test_a_full_sync_keeps_its_checkpoint_while_fresh_is_failing(self):
+        self.env["product.template"].create({"name": "Test product", "plu_code": 601})
+        self.digi_client.write(
+            {"full_sync_state": "running", "full_sync_started_at": "2024-01-01"}
+        )
+
+        with self.patch_request_post(status_code=503), self.assertRaises(
+            RetryableJobError
+        ):
+            self.digi_client._full_sync_step()
+
+        self.assertEqual(self.digi_client.full_sync_state, "running")
+        self.assertFalse(self.digi_client.full_sync_category_checkpoint)
+        self.assertFalse(self.digi_client.full_sync_product_checkpoint)
+        self.assertFalse(self.digi_client.full_sync_failed_count)
+
+    def test_it_resumes_a_full_sync_from_its_checkpoint(self):
+        self.env["product.category"].create(
+            {"name": "Test category", "external_digi_id": 501}
+        )
+        products = self.env["product.template"].create(
+            [
+                {"name": "Test product 1", "plu_code": 601},
+                {"name": "Test product 2", "plu_code": 602},
+            ]
+        )
+        max_category_id = self.env["product.category"].search(
+            [], order="id desc", limit=1
+        )
+        self.digi_client.write(
+            {
+                "full_sync_state": "running",
+                "full_sync_started_at": "2024-01-01 00:00:00",
+                "full_sync_category_checkpoint": max_category_id.id,
+                "full_sync_product_checkpoint": products[0].id,
+            }
+        )
+
+        with self.patch_request_post() as post_spy:
+            self.digi_client.with_context(queue_job__no_delay=True).full_sync(
+                resume=True
+            )
+
+            sent_plu_codes = [
+                json.loads(call.kwargs["data"])["DataId"]
+                for call in post_spy.call_args_list
+            ]
+
+        self.assertEqual(sent_plu_codes, [602])
+        self.assertEqual(self.digi_client.full_sync_state, "done")
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_the_async_sender_posts_concurrently_and_reports_per_item(self):
+        in_flight = [0]
+        max_in_flight = [0]
+
+        async def handler(request):
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            data_id = json.loads(request.content)["DataId"]
+            result = -2 if data_id == 3 else 1
+            return httpx.Response(
+                200, json={"Result": result, "ResultDescription": "Invalid"}
+            )
+
+        sender = AsyncSender(
+            self.digi_client.create_header(),
+            4,
+            DigiClient._check_response,
+            transport=httpx.MockTransport(handler),
+        )
+        url = self.digi_client.create_article_url()
+        errors = sender.send(
+            [(url, json.dumps({"DataId": data_id})) for data_id in range(10)]
+        )
+
+        self.assertIsInstance(errors[3], DigiApiException)
+        self.assertEqual(str(errors[3]), "Error -2: Invalid")
+        self.assertEqual(errors[:3] + errors[4:], [None] * 9)
+        self.assertEqual(max_in_flight[0], 4)
+
+    def test_it_fails_jobs_on_payload_errors_without_retrying(self):
+        with self.assertRaises(FailedJobError):
+            self.digi_client._handle_job_exception(
+                DigiApiException("Error -2: Validation failed")
+            )
+
+        response = requests.Response()
+        response.status_code = 400
+        with self.assertRaises(FailedJobError):
+            self.digi_client._handle_job_exception(
+                requests.HTTPError(response=response)
+            )
+
+    def test_it_retries_transient_errors_with_exponential_backoff(self):
+        self.digi_client.write({"retry_base_delay": 10, "retry_max_delay": 60})
+        delays = []
+        for attempt in range(1, 5):
+            with patch.object(
+                DigiClient, "_get_job_attempt", return_value=attempt
+            ), self.assertRaises(RetryableJobError) as context:
+                self.digi_client._handle_job_exception(requests.ConnectionError())
+            delays.append(context.exception.seconds)
+
+        for delay, (minimum, maximum) in zip(
+            delays, [(5, 10), (10, 20), (20, 40), (30, 60)], strict=True
+        ):
+            self.assertTrue(minimum <= delay <= maximum, delays)
+
+    def test_it_waits_at_least_as_long_as_asked_when_throttled(self):
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = "120"
+
+        with self.assertRaises(RetryableJobError) as context:
+            self.digi_client._handle_job_exception(
+                requests.HTTPError(response=response)
+            )
+
+        self.assertEqual(context.exception.seconds, 120)
+
+    def test_it_gives_up_after_the_maximum_number_of_attempts(self):
+        self.digi_client.retry_max_attempts = 3
+
+        with patch.object(
+            DigiClient, "_get_job_attempt", return_value=3
+        ), self.assertRaises(FailedJobError):
+            self.digi_client._handle_job_exception(requests.Timeout())
+
+    def test_the_retry_policy_adds_jitter_to_the_delay(self):
+        low = RetryPolicy(10, 600, 5, rng=lambda: 0.0)
+        high = RetryPolicy(10, 600, 5, rng=lambda: 1.0)
+
+        self.assertEqual([low.get_delay(n) for n in (1, 2, 3)], [5, 10, 20])
+        self.assertEqual([high.get_delay(n) for n in (1, 2, 3)], [10, 20, 40])
+
+    def test_it_stores_timings_and_counters_of_sync_jobs(self):
+        product = self.env["product.template"].create(
+            {"name": "Test Product", "plu_code": 300}
+        )
+        with self.patch_request_post():
+            with self.digi_client._measure_job("article"):
+                self.digi_client.send_product_to_digi(product)
+
+        self.env["product_digi_sync.sync_stat"]._cron_add_samples()
+        stats = {
+            (stat.stage, stat.endpoint or ""): stat
+            for stat in self.digi_client.stat_ids
+        }
+        self.assertEqual(
+            set(stats),
+            {
+                ("job", "article"),
+                ("transform", "article"),
+                ("read", "article"),
+                ("request", "ARTICLE.SVC"),
+            },
+        )
+        request = stats["request", "ARTICLE.SVC"]
+        self.assertEqual(request.count, 1)
+        self.assertEqual(request.failure_count, 0)
+        self.assertGreater(request.payload_bytes, 0)
+        self.assertEqual(sum(json.loads(request.histogram)), 1)
+
+    def test_it_counts_failures_and_retries_of_sync_jobs(self):
+        product = self.env["product.template"].create(
+            {"name": "Test Product", "plu_code": 300}
+        )
+        with self.patch_request_post(status_code=503), self.assertRaises(
+            RetryableJobError
+        ):
+            with self.digi_client._measure_job("article"):
+                try:
+                    self.digi_client.send_product_to_digi(product)
+                except Exception as e:
+                    self.digi_client._handle_job_exception(e)
+
+        self.env["product_digi_sync.sync_stat"]._cron_add_samples()
+        stats = {
+            (stat.stage, stat.endpoint or ""): stat
+            for stat in self.digi_client.stat_ids
+        }
+        self.assertEqual(stats["request", "ARTICLE.SVC"].failure_count, 1)
+        self.assertEqual(stats["job", "article"].failure_count, 1)
+        self.assertEqual(stats["job", "article"].retry_count, 1)
+
+    def test_it_adds_up_the_samples_of_all_jobs(self):
+        product = self.env["product.template"].create(
+            {"name": "Test Product", "plu_code": 300}
+        )
+        sync_stat = self.env["product_digi_sync.sync_stat"]
+        with self.patch_request_post():
+            for _job in range(2):
+                with self.digi_client._measure_job("article"):
+                    self.digi_client.send_product_to_digi(product)
+                sync_stat._cron_add_samples()
+
+        self.assertFalse(self.env["product_digi_sync.sync_stat_sample"].search([]))
+        request = self.digi_client.stat_ids.filtered(
+            lambda stat: stat.stage == "request"
+        )
+        self.assertEqual(request.count, 2)
+        self.assertEqual(sum(json.loads(request.histogram)), 2)
+
     @contextlib.contextmanager
     def patch_request_post(self, status_code=200, response_content=None):
         if not response_content:
@@ -448,7 +902,9 @@ class DigiClientTestCase(TransactionCase):
         mock_response = requests.Response()
         mock_response.status_code = status_code
         mock_response._content = response_content.encode("utf-8")
-        with patch("requests.post", return_value=mock_response) as post_spy:
+        with patch.object(
+            requests.Session, "post", return_value=mock_response
+        ) as post_spy:
             yield post_spy
 
     def _create_product_with_image(self, name, plu_code):
@@ -0,0 +1,106 @@
+import json
+
+import requests
+
+from odoo.addons.product_digi_sync.models.digi_client import DigiApiException
+from odoo.addons.product_digi_sync.tests.common import FakeFreshTestCase
+from odoo.addons.product_digi_sync.tools.fake_fresh_server import FakeFreshServer
+from odoo.addons.product_digi_sync.tools.product_transformer import (
+    ProductTransformer,
+)
+from odoo.addons.queue_job.exception import FailedJobError, RetryableJobError
+
+
+class FakeFreshServerTestCase(FakeFreshTestCase):
+    """Sync against the fake @Fresh server, over real HTTP connections."""
+
+    server_options = {"credentials": ("user", "<PASSWORD>"), "seed": 42}
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.env["product.template"].create(
+            {"name": "Test Product", "plu_code": 300, "list_price": 2.5}
+        )
+
+    def test_it_receives_the_payload_of_the_product(self):
+        self.digi_client.send_product_to_digi(self.product)
+
+        self.assertEqual(
+            self.server.received("ARTICLE.SVC"),
+            [json.loads(ProductTransformer.transform_product_to_payload(self.product))],
+        )
+
+    def test_it_rejects_wrong_credentials(self):
+        self.digi_client.password = "wrong"
+
+        with self.assertRaises(requests.HTTPError):
+            self.digi_client.send_product_to_digi(self.product)
+
+    def test_failed_results_fail_the_job(self):
+        self.server.fail_next(result=-2, description="Validation failed")
+
+        with self.assertRaises(DigiApiException) as context:
+            self.digi_client.send_product_to_digi(self.product)
+        with self.assertRaises(FailedJobError):
+            self.digi_client._handle_job_exception(context.exception)
+
+    def test_server_errors_are_retried(self):
+        self.server.fail_next(status_code=503)
+
+        with self.assertRaises(requests.HTTPError) as context:
+            self.digi_client.send_product_to_digi(self.product)
+        with self.assertRaises(RetryableJobError):
+            self.digi_client._handle_job_exception(context.exception)
+
+        self.digi_client.send_product_to_digi(self.product)
+        self.assertEqual(
+            [request.status_code for request in self.server.requests], [503, 200]
+        )
+
+    def test_throttled_requests_are_retried_after_the_requested_delay(self):
+        self.server.retry_after = 30
+        self.server.fail_next(status_code=429)
+
+        with self.assertRaises(requests.HTTPError) as context:
+            self.digi_client.send_product_to_digi(self.product)
+        with self.assertRaises(RetryableJobError) as retry:
+            self.digi_client._handle_job_exception(context.exception)
+        self.assertGreaterEqual(retry.exception.seconds, 30)
+
+    def test_it_rate_limits_bursts_of_requests(self):
+        server = FakeFreshServer(rate_limit=1, rate_limit_burst=2).start()
+        self.addCleanup(server.stop)
+        self.digi_client.api_url = server.url
+        url = self.digi_client.create_article_url()
+
+        errors = self.digi_client._post_many_to_digi([(url, "{}")] * 4)
+
+        self.assertEqual(len([error for error in errors if error]), 2)
+        self.assertEqual(
+            sorted(request.status_code for request in server.requests),
+            [200, 200, 429, 429],
+        )
+
+    def test_it_reports_random_errors_per_item_of_a_batch(self):
+        self.server.error_rate = 0.3
+        self.server.failure_rate = 0.2
+        url = self.digi_client.create_article_url()
+
+        errors = self.digi_client._post_many_to_digi(
+            [(url, json.dumps({"DataId": data_id})) for data_id in range(50)]
+        )
+
+        failed_count = len([error for error in errors if error])
+        self.assertTrue(0 < failed_count < 50)
+        self.assertEqual(
+            failed_count,
+            len([request for request in self.server.requests if request.result != 1]),
+        )
+
+    def test_it_answers_unknown_paths_with_not_found(self):
+        root = self.server.url.rsplit("/API", 1)[0]
+
+        for path in ("/", "/GET", "/API/V1/UNKNOWN.SVC/GET"):
+            with self.subTest(path=path):
+                response = requests.get(root + path, timeout=5)
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,123 @@
+import json
+
+from odoo.tests import TransactionCase
+
+from odoo.addons.product_digi_sync.tools.fake_fresh_server import FakeFreshServer
+from odoo.addons.product_digi_sync.tools.product_transformer import (
+    ProductTransformer,
+)
+from odoo.addons.queue_job.exception import RetryableJobError
+from odoo.addons.queue_job.tests.common import trap_jobs
+
+
+class FanOutTestCase(TransactionCase):
+    """Send to several @Fresh clients, each with its own fake server."""
+
+    def setUp(self):
+        super().setUp()
+        self.servers = [FakeFreshServer().start(), FakeFreshServer().start()]
+        for server in self.servers:
+            self.addCleanup(server.stop)
+        self.clients = self.env["product_digi_sync.digi_client"].create(
+            [
+                {
+                    "name": f"Store {index}",
+                    "username": "user",
+                    "password": "<PASSWORD>",
+                    "api_url": server.url,
+                    "receive_changes": index > 0,
+                }
+                for index, server in enumerate(self.servers)
+            ]
+        )
+        for client in self.clients:
+            self.addCleanup(client._discard_sessions)
+        config = self.env["ir.config_parameter"]
+        config.set_param("digi_sync_products_enabled", True)
+        config.set_param("digi_client_id", self.clients[0].id)
+        self.products = self.env["product.template"].create(
+            [
+                {"name": "Cheap product", "plu_code": 405, "list_price": 1.0},
+                {"name": "Expensive product", "plu_code": 406, "list_price": 20.0},
+            ]
+        )
+
+    def test_it_sends_the_same_payloads_to_all_clients(self):
+        self.assertEqual(
+            self.env["product_digi_sync.digi_client"]._get_sync_clients(),
+            self.clients,
+        )
+
+        self.products.send_to_digi_directly()
+
+        expected = [
+            json.loads(payload)
+            for payload in ProductTransformer.transform_products_to_payloads(
+                self.products
+            )
+        ]
+        for server in self.servers:
+            self.assertCountEqual(server.received("ARTICLE.SVC"), expected)
+        self.assertEqual(set(self._get_states().mapped("status")), {"sent"})
+        self.assertEqual(len(self._get_states()), 4)
+
+    def test_it_only_sends_the_products_routed_to_a_client(self):
+        self.clients[1].product_domain = "[('list_price', '>', 10)]"
+
+        self.products.send_to_digi_directly()
+
+        self.assertEqual(len(self.servers[0].received("ARTICLE.SVC")), 2)
+        self.assertEqual(
+            [body["DataId"] for body in self.servers[1].received("ARTICLE.SVC")],
+            [406],
+        )
+
+    def test_it_retries_a_failing_client_with_one_job_for_the_batch(self):
+        self.servers[1].fail_next(2, status_code=503)
+
+        with trap_jobs() as trap:
+            self.products.send_to_digi_directly()
+
+        trap.assert_jobs_count(1)
+        job = trap.enqueued_jobs[0]
+        self.assertEqual(job.recordset, self.products)
+        self.assertEqual(job.kwargs, {"client": self.clients[1]})
+        self.assertTrue(job.eta)
+        failed = self._get_states().filtered(lambda state: state.status == "failed")
+        self.assertEqual(failed.client_id, self.clients[1])
+        self.assertEqual(len(failed), 2)
+
+    def test_it_retries_rejected_records_for_that_client_only(self):
+        self.servers[1].fail_next(result=-2, description="Validation failed")
+
+        with trap_jobs() as trap:
+            self.products.send_to_digi_directly()
+
+        trap.assert_jobs_count(1)
+        job = trap.enqueued_jobs[0]
+        self.assertEqual(len(job.recordset), 1)
+        self.assertEqual(job.kwargs, {"client": self.clients[1]})
+        self.assertFalse(job.eta)
+
+    def test_a_category_that_fails_for_a_client_fails_the_job(self):
+        category = self.env["product.category"].create(
+            {"name": "Fan out category", "external_digi_id": 407}
+        )
+        self.servers[1].fail_next(status_code=503)
+
+        with self.assertRaises(RetryableJobError):
+            category.send_to_digi_directly()
+
+        self.assertEqual(
+            [body["DataId"] for body in self.servers[0].received("MAINGROUP.SVC")],
+            [407],
+        )
+
+    def _get_states(self):
+        return self.env["product_digi_sync.sync_state"].search(
+            [
+                ("res_model", "=", "product.template"),
+                ("res_id", "in", self.products.ids),
+                ("kind", "=", "article"),
+            ]
+        )
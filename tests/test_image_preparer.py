@@ -0,0 +1,58 @@
+import base64
+import io
+from unittest.mock import patch
+
+from PIL import Image
+
+from odoo.tests import TransactionCase
+
+from odoo.addons.product_digi_sync.tools import image_preparer
+from odoo.addons.product_digi_sync.tools.image_preparer import (
+    ImagePreparer,
+    sniff_image_format,
+)
+
+
+class ImagePreparerTestCase(TransactionCase):
+    def test_it_sniffs_the_format_from_the_image_header(self):
+        for pil_format, expected_format in [
+            ("PNG", "png"),
+            ("JPEG", "jpg"),
+            ("GIF", "gif"),
+            ("WEBP", "webp"),
+        ]:
+            with self.subTest(pil_format=pil_format):
+                image_base64 = self._create_image(pil_format)
+
+                self.assertEqual(sniff_image_format(image_base64), expected_format)
+
+    def test_it_returns_none_for_unknown_headers(self):
+        self.assertIsNone(sniff_image_format(base64.b64encode(b"not an image")))
+
+    def test_it_only_falls_back_to_pil_for_unknown_headers(self):
+        image_base64 = self._create_image("PNG")
+
+        with patch.object(image_preparer.Image, "open") as open_spy:
+            image_format = ImagePreparer.get_format(image_base64)
+
+        self.assertEqual(image_format, "png")
+        self.assertEqual(open_spy.call_count, 0)
+
+        bmp_base64 = self._create_image("BMP")
+        self.assertEqual(ImagePreparer.get_format(bmp_base64), "bmp")
+
+    def test_it_caches_the_format_per_source_hash(self):
+        image_base64 = self._create_image("PNG")
+        ImagePreparer.get_format(image_base64, "checksum-of-the-png")
+
+        with patch.object(image_preparer, "sniff_image_format") as sniff_spy:
+            image_format = ImagePreparer.get_format(image_base64, "checksum-of-the-png")
+
+        self.assertEqual(image_format, "png")
+        self.assertEqual(sniff_spy.call_count, 0)
+
+    def _create_image(self, pil_format):
+        image = Image.new("RGB", (1, 1))
+        output = io.BytesIO()
+        image.save(output, format=pil_format)
+        return base64.b64encode(output.getvalue())
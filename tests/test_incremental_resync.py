@@ -0,0 +1,140 @@
+import base64
+import io
+
+from PIL import Image
+
+from odoo.addons.product_digi_sync.tests.common import FakeFreshTestCase
+from odoo.addons.product_digi_sync.tools.product_transformer import (
+    ProductTransformer,
+)
+
+
+class IncrementalResyncTestCase(FakeFreshTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sync_state = self.env["product_digi_sync.sync_state"]
+        self.category = self.env["product.category"].create(
+            {"name": "Resync category", "external_digi_id": 701}
+        )
+        self.products = self.env["product.template"].create(
+            [
+                {"name": "Resync product 1", "plu_code": 711},
+                {"name": "Resync product 2", "plu_code": 712},
+                {"name": "Not sent", "plu_code": 0},
+            ]
+        )
+        self._route_only(self.products, self.category)
+
+    def test_it_finds_records_that_were_never_sent(self):
+        self.assertEqual(self._get_stale_products(), self.products[:2])
+        self.assertIn(
+            self.category.id,
+            self.sync_state._get_stale_record_ids(self.digi_client, "category"),
+        )
+
+    def test_it_records_what_was_sent_and_when(self):
+        self.digi_client.send_products_to_digi(self.products[:2])
+
+        state = self.sync_state._find(self.digi_client, self.products[0], "article")
+        self.assertEqual(state.status, "sent")
+        self.assertTrue(state.synced_at)
+        self.assertEqual(
+            state.payload_hash,
+            self.sync_state._hash_payload(
+                ProductTransformer.transform_product_to_payload(self.products[0])
+            ),
+        )
+        self.assertFalse(self._get_stale_products())
+
+    def test_it_stores_the_hash_of_every_record_sent_again(self):
+        products = self.products[:2]
+        self.digi_client.send_products_to_digi(products)
+        products.write({"list_price": 4.5})
+
+        self.digi_client.send_products_to_digi(products)
+
+        for product in products:
+            state = self.sync_state._find(self.digi_client, product, "article")
+            self.assertEqual(
+                state.payload_hash,
+                self.sync_state._hash_payload(
+                    ProductTransformer.transform_product_to_payload(product)
+                ),
+            )
+
+    def test_it_finds_failed_and_changed_records(self):
+        self.server.fail_next(result=-2, description="Validation failed")
+        self.digi_client.send_products_to_digi(self.products[:2])
+        self.assertEqual(self._get_stale_products(), self.products[0])
+        self.assertEqual(
+            self.sync_state._find(self.digi_client, self.products[0], "article").status,
+            "failed",
+        )
+
+        self._backdate_states()
+        self.products[1].list_price = 9.99
+
+        self.assertEqual(self._get_stale_products(), self.products[:2])
+
+    def test_it_only_resends_records_whose_payload_changed(self):
+        self.digi_client.send_products_to_digi(self.products[:2])
+        self.digi_client.send_category_to_digi(self.category)
+        self._backdate_states()
+        self.products[0].default_code = "NOT-SENT"
+        self.products[1].name = "Renamed product"
+        self.server.reset()
+
+        counts = self.digi_client.with_context(
+            queue_job__no_delay=True
+        ).incremental_resync()
+
+        self.assertEqual(counts["article"], 1)
+        self.assertEqual(counts["category"], 0)
+        self.assertEqual(
+            [body["DataId"] for body in self.server.received("ARTICLE.SVC")], [712]
+        )
+        self.assertFalse(self._get_stale_products())
+        self.assertEqual(
+            self.digi_client.incremental_resync(),
+            {"category": 0, "article": 0, "image": 0},
+        )
+
+    def test_it_marks_unchanged_images_as_synced(self):
+        product = self.products[0]
+        product.image_1920 = self._get_image()
+        self.digi_client.send_product_image_to_digi(product)
+        self._backdate_states()
+        product.list_price = 9.99
+        self.assertIn(product.id, self._get_stale_image_ids())
+        self.server.reset()
+
+        self.digi_client.with_context(queue_job__no_delay=True).incremental_resync()
+
+        self.assertEqual(self.server.received("MultiMedia.SVC"), [])
+        self.assertNotIn(product.id, self._get_stale_image_ids())
+
+    def test_it_only_resyncs_records_routed_to_the_client(self):
+        self.digi_client.product_domain = "[('plu_code', '=', 712)]"
+
+        counts = self.digi_client.incremental_resync()
+
+        self.assertEqual(counts["article"], 1)
+
+    def _backdate_states(self):
+        """Pretend the records were sent before they were last changed."""
+        # Within a test, records are written at the start of the transaction
+        self.sync_state.search([("client_id", "=", self.digi_client.id)]).write(
+            {"synced_at": "2000-01-01 00:00:00"}
+        )
+
+    def _get_stale_products(self):
+        stale_ids = self.sync_state._get_stale_record_ids(self.digi_client, "article")
+        return self.products.filtered(lambda product: product.id in stale_ids)
+
+    def _get_stale_image_ids(self):
+        return self.sync_state._get_stale_record_ids(self.digi_client, "image")
+
+    def _get_image(self):
+        output = io.BytesIO()
+        Image.new("RGB", (1, 1)).save(output, format="PNG")
+        return base64.b64encode(output.getvalue())
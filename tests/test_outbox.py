@@ -0,0 +1,93 @@
+import json
+from unittest.mock import patch
+
+import requests
+
+from odoo.tests import TransactionCase
+
+from odoo.addons.queue_job.exception import RetryableJobError
+from odoo.addons.queue_job.tests.common import trap_jobs
+
+
+class OutboxTestCase(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.digi_client = self.env["product_digi_sync.digi_client"].create(
+            {
+                "name": "Test Digi Client",
+                "username": "user",
+                "password": "<PASSWORD>",
+                "delivery_mode": "outbox",
+            }
+        )
+        config = self.env["ir.config_parameter"]
+        config.set_param("digi_sync_products_enabled", True)
+        config.set_param("digi_client_id", self.digi_client.id)
+        self.outbox = self.env["product_digi_sync.outbox"]
+
+    def test_it_records_changes_once_in_the_outbox(self):
+        product = self.env["product.template"].create(
+            {"name": "Test Product", "plu_code": 405}
+        )
+        product.write({"list_price": 2.0})
+        product.write({"list_price": 3.0})
+
+        rows = self.outbox.search([("res_model", "=", "product.template")])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows.res_id, rows.kind), (product.id, "article"))
+
+    def test_it_drains_the_outbox_in_batch_jobs_with_categories_first(self):
+        category = self.env["product.category"].create(
+            {"name": "Test Category", "external_digi_id": 1145}
+        )
+        self.env["product.template"].create(
+            [
+                {"name": "Test Product 1", "plu_code": 405, "categ_id": category.id},
+                {"name": "Test Product 2", "plu_code": 406, "categ_id": category.id},
+            ]
+        )
+        category.write({"name": "Test Category altered"})
+
+        with trap_jobs() as trap:
+            self.outbox._cron_drain()
+
+            self.assertFalse(self.outbox.search([]))
+            trap.assert_jobs_count(2)
+            with self._patch_session_post() as post_spy:
+                trap.perform_enqueued_jobs()
+
+                sent = [
+                    (call.kwargs["url"].split("/")[-2], json.loads(call.kwargs["data"]))
+                    for call in post_spy.call_args_list
+                ]
+
+        self.assertEqual(
+            [endpoint for endpoint, _payload in sent],
+            ["MAINGROUP.SVC", "ARTICLE.SVC", "ARTICLE.SVC"],
+        )
+        self.assertEqual(sent[0][1]["Names"][0]["Name"], "Test Category altered")
+
+    def test_a_failing_fresh_retries_the_batch_instead_of_splitting_it(self):
+        self.env["product.template"].create(
+            [
+                {"name": "Test Product 1", "plu_code": 405},
+                {"name": "Test Product 2", "plu_code": 406},
+            ]
+        )
+
+        with trap_jobs() as trap:
+            self.outbox._cron_drain()
+            with self._patch_session_post(status_code=503), self.assertRaises(
+                RetryableJobError
+            ):
+                trap.perform_enqueued_jobs()
+
+            trap.assert_jobs_count(0)
+
+    def _patch_session_post(self, status_code=200):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps({"Result": 1, "ResultDescription": "Ok"}).encode(
+            "utf-8"
+        )
+        return patch.object(requests.Session, "post", return_value=response)
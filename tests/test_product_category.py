@@ -2,16 +2,16 @@ from unittest.mock import patch
 
 from odoo.tests import TransactionCase
 
-from odoo.addons.base.models.ir_config_parameter import IrConfigParameter
 from odoo.addons.product_digi_sync.models.digi_client import DigiClient
 from odoo.addons.queue_job.models.base import Base as QueueJobBase
+from odoo.addons.queue_job.tests.common import trap_jobs
 
 
 class ProductCategoryTestCase(TransactionCase):
     def setUp(self):
         super().setUp()
 
-        def mock_with_delay(with_delay_self):
+        def mock_with_delay(with_delay_self, **kwargs):
             return with_delay_self
 
         self.patcher = patch.object(QueueJobBase, "with_delay", mock_with_delay)
@@ -32,7 +32,7 @@ class ProductCategoryTestCase(TransactionCase):
             }
         )
 
-        patch.object(IrConfigParameter, "get_param", digi_client.id)
+        self._configure_digi_client(digi_client.id)
 
         with patch.object(
             DigiClient, "send_category_to_digi"
@@ -59,7 +59,7 @@ class ProductCategoryTestCase(TransactionCase):
             }
         )
 
-        patch.object(IrConfigParameter, "get_param", digi_client.id)
+        self._configure_digi_client(digi_client.id)
 
         with patch.object(
             DigiClient, "send_category_to_digi"
@@ -77,3 +77,117 @@ class ProductCategoryTestCase(TransactionCase):
             )
 
             self.assertEqual(mock_send_category_to_digi.call_args[0][0], category)
+
+    def test_it_sends_the_category_as_it_is_after_the_write(self):
+        self._configure_digi_client(self._create_digi_client().id)
+        category = self.env["product.category"].create(
+            {"name": "Test Category", "external_digi_id": 1146}
+        )
+        sent_names = []
+
+        with patch.object(
+            DigiClient,
+            "send_category_to_digi",
+            side_effect=lambda category: sent_names.append(category.name),
+        ):
+            category.write({"name": "Test Category altered"})
+            category.write({"barcode_rule_id": False})
+
+        self.assertEqual(sent_names, ["Test Category altered"])
+
+    def test_it_sends_the_articles_of_a_category_after_the_category(self):
+        category = self.env["product.category"].create({"name": "Test Category"})
+        product = self.env["product.template"].create(
+            {"name": "Test Product", "plu_code": 1147, "categ_id": category.id}
+        )
+        self._configure_digi_client(self._create_digi_client().id)
+
+        with trap_jobs() as trap:
+            category.write({"external_digi_id": 1148})
+
+        trap.assert_jobs_count(2)
+        category_job, article_job = sorted(
+            trap.enqueued_jobs, key=lambda job: job.recordset._name != category._name
+        )
+        self.assertEqual(category_job.recordset, category)
+        self.assertEqual(article_job.recordset, product)
+        self.assertEqual(
+            {job.uuid for job in article_job.depends_on}, {category_job.uuid}
+        )
+
+    def test_it_sends_categories_in_batches_before_their_articles(self):
+        categories = self.env["product.category"].create(
+            [{"name": f"Test Category {index}"} for index in range(3)]
+        )
+        products = self.env["product.template"].create(
+            [{"name": "Test Product", "plu_code": 1149, "categ_id": categories[0].id}]
+        )
+        digi_client = self._create_digi_client()
+        digi_client.batch_size = 2
+        self._configure_digi_client(digi_client.id)
+
+        with trap_jobs() as trap:
+            categories.send_to_digi(products)
+
+        category_jobs = [
+            job for job in trap.enqueued_jobs if job.recordset._name == categories._name
+        ]
+        article_jobs = [job for job in trap.enqueued_jobs if job.recordset == products]
+        self.assertEqual([len(job.recordset) for job in category_jobs], [2, 1])
+        self.assertEqual(
+            {job.uuid for job in article_jobs[0].depends_on},
+            {job.uuid for job in category_jobs},
+        )
+
+    def test_new_articles_wait_for_their_new_category(self):
+        self._configure_digi_client(self._create_digi_client().id)
+
+        with trap_jobs() as trap:
+            category = self.env["product.category"].create(
+                {"name": "Test Category", "external_digi_id": 1150}
+            )
+            product = self.env["product.template"].create(
+                {"name": "Test Product", "plu_code": 1151, "categ_id": category.id}
+            )
+
+        category_jobs = [job for job in trap.enqueued_jobs if job.recordset == category]
+        article_jobs = [job for job in trap.enqueued_jobs if job.recordset == product]
+        self.assertEqual(len(article_jobs), 1)
+        self.assertTrue(article_jobs[0].depends_on)
+        self.assertLessEqual(
+            {job.uuid for job in article_jobs[0].depends_on},
+            {job.uuid for job in category_jobs},
+        )
+
+    def test_articles_of_a_sent_category_do_not_wait(self):
+        digi_client = self._create_digi_client()
+        category = self.env["product.category"].create(
+            {"name": "Test Category", "external_digi_id": 1152}
+        )
+        self.env["product_digi_sync.sync_state"]._record_deliveries(
+            digi_client, category, "category", [None]
+        )
+        self._configure_digi_client(digi_client.id)
+
+        with trap_jobs() as trap:
+            product = self.env["product.template"].create(
+                {"name": "Test Product", "plu_code": 1153, "categ_id": category.id}
+            )
+
+        trap.assert_jobs_count(1)
+        self.assertEqual(trap.enqueued_jobs[0].recordset, product)
+        self.assertFalse(trap.enqueued_jobs[0].depends_on)
+
+    def _create_digi_client(self):
+        return self.env["product_digi_sync.digi_client"].create(
+            {
+                "name": "Test Digi Client",
+                "username": "user",
+                "password": "<PASSWORD>",
+            }
+        )
+
+    def _configure_digi_client(self, client_id):
+        config = self.env["ir.config_parameter"]
+        config.set_param("digi_sync_products_enabled", True)
+        config.set_param("digi_client_id", client_id)
@@ -1,12 +1,13 @@
 import base64
 import io
+from datetime import timedelta
 from unittest.mock import Mock, patch
 
 from PIL import Image
 
+from odoo import fields
 from odoo.tests import TransactionCase
 
-from odoo.addons.base.models.ir_config_parameter import IrConfigParameter
 from odoo.addons.product_digi_sync.models.digi_client import DigiClient
 from odoo.addons.queue_job.models.base import Base as QueueJobBase
 
@@ -15,7 +16,7 @@ class ProductTemplateTestCase(TransactionCase):
     def setUp(self):
         super().setUp()
 
-        def mock_with_delay(with_delay_self):
+        def mock_with_delay(with_delay_self, **kwargs):
             return with_delay_self
 
         self.patcher = patch.object(QueueJobBase, "with_delay", mock_with_delay)
@@ -29,7 +30,7 @@ class ProductTemplateTestCase(TransactionCase):
     def test_it_logs_an_error_when_plu_code_is_set_but_no_digi_client_is_provided(
         self, mock_logger
     ):
-        self._patch_ir_config_parameter_for_get_param("-1")
+        self._configure_digi_client("-1")
 
         product = self.env["product.template"].create(
             {"name": "Test Product Template", "plu_code": 405}
@@ -56,7 +57,7 @@ class ProductTemplateTestCase(TransactionCase):
 
         digi_client = self._create_digi_client()
 
-        self._patch_ir_config_parameter_for_get_param(digi_client.id)
+        self._configure_digi_client(digi_client.id)
         mock_send_product_to_digi = Mock()
         patch.object(
             DigiClient, "send_product_to_digi", mock_send_product_to_digi
@@ -65,12 +66,133 @@ class ProductTemplateTestCase(TransactionCase):
 
         products.write(
             {
-                "name": "Test Product Template",
+                "name": "Test Product Template altered",
             }
         )
 
         self.assertEqual(mock_send_product_to_digi.call_args[0][0], product1)
 
+    def test_it_does_not_send_the_product_when_no_digi_fields_changed(self):
+        product = self.env["product.template"].create(
+            {"name": "Test Product Template", "plu_code": 405}
+        )
+
+        digi_client = self._create_digi_client()
+
+        self._configure_digi_client(digi_client.id)
+        mock_send_product_to_digi = Mock()
+        patch.object(
+            DigiClient, "send_product_to_digi", mock_send_product_to_digi
+        ).start()
+        mock_send_product_image_to_digi = Mock()
+        patch.object(
+            DigiClient, "send_product_image_to_digi", mock_send_product_image_to_digi
+        ).start()
+
+        product.write({"description_sale": "Not shown on the scale", "sale_ok": False})
+        product.write({"name": "Test Product Template"})
+
+        self.assertEqual(mock_send_product_to_digi.call_count, 0)
+        self.assertEqual(mock_send_product_image_to_digi.call_count, 0)
+
+    def test_it_sends_multiple_products_to_digi_as_a_batch(self):
+        products = self.env["product.template"].create(
+            [
+                {"name": "Test Product Template 1", "plu_code": 405},
+                {"name": "Test Product Template 2", "plu_code": 406},
+                {"name": "Test Product without plu"},
+            ]
+        )
+
+        digi_client = self._create_digi_client()
+
+        self._configure_digi_client(digi_client.id)
+        mock_send_products_to_digi = Mock(return_value=[])
+        patch.object(
+            DigiClient, "send_products_to_digi", mock_send_products_to_digi
+        ).start()
+        patch.object(DigiClient, "send_product_image_to_digi", Mock()).start()
+
+        products.write({"list_price": 3.0})
+
+        self.assertEqual(mock_send_products_to_digi.call_count, 1)
+        self.assertEqual(mock_send_products_to_digi.call_args[0][0], products[:2])
+
+    def test_it_delays_jobs_with_an_identity_key_per_record_and_kind(self):
+        product = self.env["product.template"].create({"name": "Test Product"})
+        delay_kwargs = []
+
+        def spy_with_delay(with_delay_self, **kwargs):
+            delay_kwargs.append(kwargs)
+            return Mock()
+
+        with patch.object(QueueJobBase, "with_delay", spy_with_delay):
+            product.send_to_digi()
+            product._digi_with_delay("image")
+
+        self.assertEqual(
+            [kwargs["identity_key"] for kwargs in delay_kwargs],
+            [
+                f"product_digi_sync:product.template:article:{product.id}",
+                f"product_digi_sync:product.template:image:{product.id}",
+            ],
+        )
+
+    def test_it_postpones_pending_jobs_within_the_debounce_delay(self):
+        digi_client = self._create_digi_client()
+        digi_client.debounce_delay = 30
+        self._configure_digi_client(digi_client.id)
+        self.patcher.stop()
+        try:
+            product = self.env["product.template"].create(
+                {"name": "Test Product Template", "plu_code": 405}
+            )
+            jobs = self.env["queue.job"].search(
+                [("identity_key", "=", product._get_digi_identity_key("article"))]
+            )
+            self.assertEqual(len(jobs), 1)
+            jobs.eta = fields.Datetime.now() + timedelta(seconds=5)
+
+            product.write({"list_price": 4.0})
+
+            jobs = self.env["queue.job"].search(
+                [("identity_key", "=", product._get_digi_identity_key("article"))]
+            )
+            self.assertEqual(len(jobs), 1)
+            self.assertGreater(jobs.eta, fields.Datetime.now() + timedelta(seconds=20))
+        finally:
+            self.patcher.start()
+
+    def test_it_does_not_queue_records_that_are_in_a_pending_batch_job(self):
+        digi_client = self._create_digi_client()
+        self._configure_digi_client(digi_client.id)
+        self.patcher.stop()
+        try:
+            products = self.env["product.template"].create(
+                [
+                    {"name": "Test Product 1", "plu_code": 405},
+                    {"name": "Test Product 2", "plu_code": 406},
+                ]
+            )
+            prefix = products._get_digi_identity_prefix("article")
+            job_domain = [("identity_key", "=like", f"{prefix}%")]
+            self.assertEqual(self.env["queue.job"].search_count(job_domain), 1)
+
+            products[0].write({"list_price": 4.0})
+            new_product = self.env["product.template"].create(
+                {"name": "Test Product 3", "plu_code": 407}
+            )
+            (products | new_product).send_to_digi()
+
+            jobs = self.env["queue.job"].search(job_domain)
+            self.assertEqual(len(jobs), 2)
+            self.assertEqual(
+                sorted(record_id for job in jobs for record_id in job.record_ids),
+                sorted((products | new_product).ids),
+            )
+        finally:
+            self.patcher.start()
+
     def _create_digi_client(self):
         digi_client = self.env["product_digi_sync.digi_client"].create(
             {
@@ -85,7 +207,7 @@ class ProductTemplateTestCase(TransactionCase):
         digi_client = self._create_digi_client()
 
         client_id = digi_client.id
-        self._patch_ir_config_parameter_for_get_param(client_id)
+        self._configure_digi_client(client_id)
         mock_send_product_image_to_digi = Mock()
         patch.object(
             DigiClient, "send_product_image_to_digi", mock_send_product_image_to_digi
@@ -95,18 +217,55 @@ class ProductTemplateTestCase(TransactionCase):
         product = self._create_product_with_image("Test Product Template", 400)
 
         self.assertEqual(mock_send_product_image_to_digi.call_args[0][0], product)
-        patch.object(IrConfigParameter, "get_param", digi_client.id).stop()
 
-    def _patch_ir_config_parameter_for_get_param(self, client_id):
-        original_get_param = IrConfigParameter.get_param
+    def test_it_sends_the_image_again_only_when_it_changed(self):
+        digi_client = self._create_digi_client()
+        self._configure_digi_client(digi_client.id)
+        product = self._create_product_with_image("Test Product Template", 400)
+        mock_send_product_image_to_digi = Mock()
+        patch.object(
+            DigiClient, "send_product_image_to_digi", mock_send_product_image_to_digi
+        ).start()
+        patch.object(DigiClient, "send_product_to_digi", Mock()).start()
+
+        product.image_1920 = product.image_1920
+        self.assertEqual(mock_send_product_image_to_digi.call_count, 0)
+
+        output = io.BytesIO()
+        Image.new("RGB", (2, 2)).save(output, format="PNG")
+        product.image_1920 = base64.b64encode(output.getvalue())
+        self.assertEqual(mock_send_product_image_to_digi.call_count, 1)
+
+    def _configure_digi_client(self, client_id):
+        config = self.env["ir.config_parameter"]
+        config.set_param("digi_sync_products_enabled", True)
+        config.set_param("digi_client_id", client_id)
+
+    def test_it_enqueues_no_jobs_while_syncing_is_disabled(self):
+        digi_client = self._create_digi_client()
+        self._configure_digi_client(digi_client.id)
+        self.env["ir.config_parameter"].set_param("digi_sync_products_enabled", False)
+
+        with patch.object(QueueJobBase, "with_delay") as with_delay_spy:
+            self.env["product.template"].create(
+                {"name": "Test Product Template", "plu_code": 405}
+            )
+
+        with_delay_spy.assert_not_called()
+
+    def test_it_resolves_the_configured_client_without_queries(self):
+        digi_client = self._create_digi_client()
+        client_model = self.env["product_digi_sync.digi_client"]
+        self.env["ir.config_parameter"].set_param("digi_client_id", False)
+        self.assertFalse(client_model._get_configured_client())
 
-        def patched_get_param(self, key, default=False):
-            if key == "digi_client_id":
-                return client_id  # return a specific value for a particular key
-            else:
-                return original_get_param(self, key, default)
+        self._configure_digi_client(digi_client.id)
+        self.assertEqual(client_model._get_configured_client(), digi_client)
+        with self.assertQueryCount(0):
+            client_model._get_configured_client()
 
-        patch.object(IrConfigParameter, "get_param", patched_get_param).start()
+        digi_client.unlink()
+        self.assertFalse(client_model._get_configured_client())
 
     def _create_product_with_image(self, name, plu_code):
         product_with_image = self.env["product.template"].create(
@@ -1,4 +1,5 @@
 from odoo.tests import TransactionCase, tagged
+from odoo.tools import get_barcode_check_digit
 
 
 class ProductTemplateBarcodeFromPluTestCase(TransactionCase):
@@ -20,3 +21,69 @@ class ProductTemplateBarcodeFromPluTestCase(TransactionCase):
         )
 
         self.assertEqual(product_template.barcode, "2300100000008")
+
+    def test_it_computes_the_barcodes_of_many_products_per_rule(self):
+        rules = self.env["barcode.rule"].create(
+            [
+                {
+                    "name": "Test EAN",
+                    "encoding": "ean13",
+                    "type": "price",
+                    "pattern": "27.....{NNNDD}",
+                },
+                {
+                    "name": "Test any",
+                    "encoding": "any",
+                    "type": "price",
+                    "pattern": "21....{NNDDD}",
+                },
+            ]
+        )
+        categories = self.env["product.category"].create(
+            [
+                {"name": f"Test category {rule.name}", "barcode_rule_id": rule.id}
+                for rule in rules
+            ]
+        )
+        products = self.env["product.template"].create(
+            [
+                {
+                    "name": f"Test product {plu_code}",
+                    "plu_code": plu_code,
+                    "categ_id": category.id,
+                }
+                for category in categories
+                for plu_code in (7, 1234)
+            ]
+        )
+
+        self.assertEqual(
+            products.mapped("barcode"),
+            ["2700007000000", "2701234000009", "21000700000", "21123400000"],
+        )
+
+    def test_prepare_barcode_matches_the_ean_check_digit(self):
+        prepare_barcode = self.env["product.template"]._prepare_barcode
+        for plu_code in (1, 42, 999, 12345):
+            barcode = prepare_barcode("23.....{NNNDD}", plu_code, True)
+            self.assertEqual(
+                barcode[-1], str(get_barcode_check_digit(barcode[:-1] + "0"))
+            )
+            self.assertEqual(barcode[2:7], str(plu_code).zfill(5))
+
+    def test_it_caches_the_parsed_pattern_until_the_rule_changes(self):
+        rule = self.env["barcode.rule"].create(
+            {
+                "name": "Test EAN",
+                "encoding": "ean13",
+                "type": "price",
+                "pattern": "27.....{NNNDD}",
+            }
+        )
+        pattern = rule._get_barcode_pattern()
+        self.assertIs(rule._get_barcode_pattern(), pattern)
+        self.assertEqual(pattern.flag, 27)
+
+        rule.pattern = "28.....{NNNDD}"
+
+        self.assertEqual(rule._get_barcode_pattern().flag, 28)
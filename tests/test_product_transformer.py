@@ -0,0 +1,70 @@
+import json
+
+from odoo.tests import TransactionCase
+
+from odoo.addons.product_digi_sync.tools.product_transformer import (
+    ProductTransformer,
+)
+
+
+class ProductTransformerTestCase(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.barcode_rule = self.env["barcode.rule"].create(
+            {
+                "name": "Test barcode",
+                "encoding": "ean13",
+                "type": "price",
+                "pattern": "27.....{NNNDD}",
+                "digi_barcode_type_id": 42,
+            }
+        )
+
+    def test_it_builds_the_same_payloads_for_a_batch_as_one_by_one(self):
+        products = self._create_products(3)
+
+        payloads = ProductTransformer.transform_products_to_payloads(products)
+
+        self.assertEqual(
+            payloads,
+            [
+                ProductTransformer.transform_product_to_payload(product)
+                for product in products
+            ],
+        )
+        self.assertEqual(json.loads(payloads[0])["NormalBarcode1"]["Flag"], 27)
+
+    def test_it_uses_a_constant_number_of_queries_for_a_batch(self):
+        small_batch = self._create_products(2)
+        large_batch = self._create_products(20)
+
+        self.assertEqual(
+            self._count_queries(small_batch), self._count_queries(large_batch)
+        )
+
+    def _count_queries(self, products):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        query_count = self.env.cr.sql_log_count
+        ProductTransformer.transform_products_to_payloads(products)
+        return self.env.cr.sql_log_count - query_count
+
+    def _create_products(self, count):
+        products = self.env["product.template"]
+        for index in range(count):
+            category = self.env["product.category"].create(
+                {
+                    "name": f"Test category {index}",
+                    "barcode_rule_id": self.barcode_rule.id,
+                }
+            )
+            products |= self.env["product.template"].create(
+                {
+                    "name": f"Test product {index}",
+                    "plu_code": 100 + index,
+                    "categ_id": category.id,
+                    "list_price": 2.5,
+                    "standard_price": 1.5,
+                }
+            )
+        return products
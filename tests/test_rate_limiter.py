@@ -0,0 +1,53 @@
+from odoo.tests import TransactionCase
+
+from odoo.addons.product_digi_sync.tools.rate_limiter import (
+    AdaptiveConcurrency,
+    TokenBucket,
+    throttle_registry,
+)
+
+
+class RateLimiterTestCase(TransactionCase):
+    def test_the_token_bucket_allows_a_burst_and_then_the_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+
+        self.assertEqual(
+            [bucket.reserve() for _ in range(5)], [0.0, 0.0, 0.0, 0.5, 1.0]
+        )
+
+        now[0] += 1.0
+        self.assertEqual(bucket.reserve(), 0.5)
+
+    def test_the_concurrency_limit_halves_on_overload(self):
+        concurrency = AdaptiveConcurrency(maximum=4)
+
+        self.assertEqual(
+            [concurrency.acquire(timeout=0) for _ in range(5)],
+            [True, True, True, True, False],
+        )
+
+        concurrency.release(overloaded=True)
+        self.assertEqual(concurrency.limit, 2)
+        self.assertFalse(concurrency.acquire(timeout=0))
+
+    def test_the_concurrency_limit_grows_back_on_success(self):
+        concurrency = AdaptiveConcurrency(maximum=4)
+        concurrency.acquire()
+        concurrency.release(overloaded=True)
+        concurrency.acquire()
+        concurrency.release(overloaded=True)
+        self.assertEqual(concurrency.limit, 1)
+
+        for _ in range(10):
+            concurrency.acquire()
+            concurrency.release()
+
+        self.assertEqual(concurrency.limit, 4)
+
+    def test_the_throttle_is_shared_per_client_and_settings(self):
+        throttle = throttle_registry.get(("test_db", 1), 5.0, 10, 4)
+
+        self.assertIs(throttle_registry.get(("test_db", 1), 5.0, 10, 4), throttle)
+        self.assertIsNot(throttle_registry.get(("test_db", 2), 5.0, 10, 4), throttle)
+        self.assertIsNot(throttle_registry.get(("test_db", 1), 1.0, 10, 4), throttle)
@@ -0,0 +1,119 @@
+import json
+from unittest.mock import patch
+
+from odoo.addons.product_digi_sync.models.digi_client import DigiClient
+from odoo.addons.product_digi_sync.tests.common import FakeFreshTestCase
+from odoo.addons.product_digi_sync.tools.payload_digest import get_digest
+from odoo.addons.queue_job.tests.common import trap_jobs
+
+
+class ReconcileTestCase(FakeFreshTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = self.env["product.category"].create(
+            {"name": "Reconcile category", "external_digi_id": 801}
+        )
+        self.products = self.env["product.template"].create(
+            [
+                {
+                    "name": f"Reconcile product {index}",
+                    "plu_code": 810 + index,
+                    "list_price": 2.5,
+                    "categ_id": self.category.id,
+                }
+                for index in range(3)
+            ]
+        )
+        self._route_only(self.products, self.category)
+        self.digi_client.send_category_to_digi(self.category)
+        self.digi_client.send_products_to_digi(self.products)
+
+    def test_it_sends_nothing_when_fresh_holds_the_same_data(self):
+        # @Fresh returns fields that are not sent, and numbers as floats
+        for article in self.server.data["ARTICLE.SVC"].values():
+            article.update({"UnitPrice": float(article["UnitPrice"]), "Tare": 0})
+        self.server.requests.clear()
+
+        counts = self._reconcile()
+
+        self.assertEqual(
+            counts["article"],
+            {"in_sync": 3, "missing": 0, "divergent": 0, "unknown": 0},
+        )
+        self.assertEqual(counts["category"]["in_sync"], 1)
+        self.assertEqual(self.server.received(), [])
+
+    def test_it_sends_everything_again_after_a_scale_reset(self):
+        self.server.reset()
+
+        counts = self._reconcile()
+
+        self.assertEqual(counts["article"]["missing"], 3)
+        self.assertEqual(counts["category"]["missing"], 1)
+        self.assertEqual(len(self.server.data["ARTICLE.SVC"]), 3)
+        self.assertEqual(list(self.server.data["MAINGROUP.SVC"]), [801])
+
+    def test_it_sends_the_articles_once_their_main_groups_are_sent(self):
+        self.server.reset()
+
+        with trap_jobs() as trap:
+            self.digi_client.reconcile()
+
+        category_jobs = [
+            job for job in trap.enqueued_jobs if job.recordset == self.category
+        ]
+        article_jobs = [
+            job for job in trap.enqueued_jobs if job.recordset == self.products
+        ]
+        self.assertEqual(len(category_jobs), 1)
+        self.assertEqual(len(article_jobs), 1)
+        self.assertEqual(
+            {job.uuid for job in article_jobs[0].depends_on}, {category_jobs[0].uuid}
+        )
+
+    def test_it_only_sends_divergent_and_missing_records(self):
+        self.server.data["ARTICLE.SVC"][810]["UnitPrice"] = 999
+        del self.server.data["ARTICLE.SVC"][811]
+        self.server.data["ARTICLE.SVC"][899] = {"DataId": 899}
+        self.server.requests.clear()
+
+        counts = self._reconcile()
+
+        self.assertEqual(
+            counts["article"],
+            {"in_sync": 1, "missing": 1, "divergent": 1, "unknown": 1},
+        )
+        self.assertCountEqual(
+            [body["DataId"] for body in self.server.received("ARTICLE.SVC")],
+            [810, 811],
+        )
+        self.assertEqual(self.server.data["ARTICLE.SVC"][810]["UnitPrice"], 250)
+
+    def test_it_pages_through_the_lists(self):
+        self.server.requests.clear()
+
+        with patch.object(DigiClient, "RECONCILE_PAGE_SIZE", 2):
+            counts = self._reconcile()
+
+        self.assertEqual(counts["article"]["in_sync"], 3)
+        self.assertEqual(
+            [
+                request.body["PageNumber"]
+                for request in self.server.requests
+                if request.endpoint == "ARTICLE.SVC"
+            ],
+            ["1", "2"],
+        )
+
+    def test_the_digest_ignores_fields_that_are_not_sent(self):
+        sent = {"DataId": 1, "UnitPrice": 250, "Names": [{"Reference": "Nl"}]}
+        held = json.loads(json.dumps(sent))
+        held.update({"UnitPrice": 250.0, "Tare": 0})
+        held["Names"][0]["Name"] = "Default"
+
+        self.assertEqual(get_digest(held, sent), get_digest(sent))
+        held["UnitPrice"] = 251
+        self.assertNotEqual(get_digest(held, sent), get_digest(sent))
+
+    def _reconcile(self):
+        return self.digi_client.with_context(queue_job__no_delay=True).reconcile()
@@ -0,0 +1,67 @@
+from odoo.tests import TransactionCase
+
+from odoo.addons.product_digi_sync.tools.sync_metrics import (
+    SyncMetrics,
+    get_percentile,
+)
+
+
+class SyncMetricsTestCase(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.now = [0.0]
+        self.metrics = SyncMetrics(clock=lambda: self.now[0])
+
+    def test_it_records_durations_in_the_current_scope_only(self):
+        with self.metrics.measure("transform", "article"):
+            self.now[0] += 1
+        with self.metrics.scope("client"):
+            with self.metrics.measure("transform", "article"):
+                self.now[0] += 0.02
+
+        stats = self.metrics.pop("client")
+        self.assertEqual(list(stats), [("transform", "article")])
+        transform = stats["transform", "article"]
+        self.assertEqual(transform.count, 1)
+        self.assertAlmostEqual(transform.total_duration, 0.02)
+        self.assertEqual(transform.buckets[2], 1)
+        self.assertEqual(self.metrics.pop("client"), {})
+
+    def test_it_records_failures_and_payload_sizes(self):
+        with self.assertRaises(ValueError):
+            with self.metrics.measure("request", "ARTICLE.SVC", "client") as obs:
+                obs.payload_bytes = 120
+                raise ValueError()
+
+        request = self.metrics.pop("client")["request", "ARTICLE.SVC"]
+        self.assertEqual(request.failure_count, 1)
+        self.assertEqual(request.payload_bytes, 120)
+
+    def test_it_restores_stats_that_could_not_be_stored(self):
+        self.metrics.record("client", "request", "ARTICLE.SVC", 0.1)
+        popped = self.metrics.pop("client")
+        self.metrics.record("client", "request", "ARTICLE.SVC", 0.3)
+
+        self.metrics.restore("client", popped)
+
+        request = self.metrics.pop("client")["request", "ARTICLE.SVC"]
+        self.assertEqual(request.count, 2)
+        self.assertAlmostEqual(request.max_duration, 0.3)
+
+    def test_it_passes_every_observation_to_the_exporters(self):
+        exported = []
+        self.metrics.add_exporter(lambda *args: exported.append(args))
+
+        self.metrics.record("client", "request", "ARTICLE.SVC", 0.1, retries=1)
+
+        self.assertEqual(
+            exported, [("client", "request", "ARTICLE.SVC", 0.1, True, 0, 1)]
+        )
+
+    def test_it_estimates_percentiles_from_the_histogram(self):
+        buckets = [0] * 13
+        buckets[4] = 90
+        buckets[8] = 10
+
+        self.assertEqual(get_percentile(buckets, 50), 0.1)
+        self.assertEqual(get_percentile(buckets, 95), 2.5)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+except ImportError:
+    _logger.debug("httpx is not installed, the asyncio sender is not available.")
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class AsyncSender:
+    """Post many requests concurrently from a single thread using asyncio.
+
+    ``check_response`` is called with every response and should raise when the
+    request failed.
+    """
+
+    def __init__(
+        self,
+        headers,
+        concurrency,
+        check_response,
+        timeout=30,
+        rate_limiter=None,
+        transport=None,
+    ):
+        if httpx is None:
+            raise RuntimeError("The asyncio sender requires the httpx package.")
+        self.headers = headers
+        self.concurrency = max(concurrency, 1)
+        self.check_response = check_response
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.transport = transport
+
+    @staticmethod
+    def is_available():
+        return httpx is not None
+
+    def send(self, items):
+        """Post every (url, body) item, and return an error or None per item."""
+        return asyncio.run(self._send_all(items))
+
+    async def _send_all(self, items):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+        )
+        async with httpx.AsyncClient(
+            headers=self.headers,
+            http2=HTTP2_AVAILABLE and self.transport is None,
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=False,
+            transport=self.transport,
+        ) as client:
+            return await asyncio.gather(
+                *(self._send_one(client, semaphore, url, body) for url, body in items)
+            )
+
+    async def _send_one(self, client, semaphore, url, body):
+        async with semaphore:
+            if self.rate_limiter:
+                await asyncio.sleep(self.rate_limiter.reserve())
+            try:
+                response = await client.post(url, **self._get_content(body))
+                self.check_response(response)
+            except Exception as e:
+                return e
+            return None
+
+    @staticmethod
+    def _get_content(body):
+        if not hasattr(body, "read"):
+            return {"content": body}
+
+        # Streamed bodies are passed on chunk by chunk, as an async iterator.
+        async def chunks():
+            for chunk in body:
+                yield chunk
+
+        return {"content": chunks(), "headers": {"Content-Length": str(len(body))}}
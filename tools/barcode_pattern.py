@@ -0,0 +1,67 @@
+import re
+
+BRACES = re.compile(r"{.*}")
+
+
+class BarcodePattern:
+    """A barcode rule pattern, parsed once to build barcodes from plu codes."""
+
+    def __init__(self, pattern, is_ean13):
+        self.pattern = pattern
+        self.is_ean13 = is_ean13
+        self.code_length = pattern.count(".")
+        self.flag = int(pattern[:2]) if re.match(r"\d{2}", pattern) else None
+        marker = "\0"
+        # The plu code only goes in when all dots of the pattern are adjacent.
+        template = pattern.replace("." * self.code_length, marker, 1)
+        braces = BRACES.search(pattern)
+        if braces:
+            template = BRACES.sub("0" * (len(braces.group()) - 2), template)
+        self.head, marker, self.tail = template.partition(marker)
+        self.has_code = bool(marker)
+        # Check digit weights per length of the plu code, see _get_check_weights
+        self._check_weights = {}
+
+    def get_barcode(self, plu_code):
+        return self.get_barcodes([plu_code])[0]
+
+    def get_barcodes(self, plu_codes):
+        """Build the barcodes of all plu codes in one pass."""
+        if not self.has_code:
+            return [self._build(self.head, "")] * len(plu_codes)
+        return [
+            self._build(self.head, str(plu_code).zfill(self.code_length), self.tail)
+            for plu_code in plu_codes
+        ]
+
+    def _build(self, head, code, tail=""):
+        if not self.is_ean13:
+            return f"{head}{code}{tail}"
+        fixed_sum, code_weights = self._get_check_weights(len(code))
+        total = fixed_sum + sum(
+            weight * int(digit)
+            for weight, digit in zip(code_weights, code, strict=True)
+        )
+        return f"{head}{code}{tail}{(10 - total % 10) % 10}"
+
+    def _get_check_weights(self, code_length):
+        """Return the weighted sum of the pattern digits, and the code weights."""
+        check_weights = self._check_weights.get(code_length)
+        if check_weights:
+            return check_weights
+        head_length = len(self.head)
+        code_end = head_length + code_length
+        length = code_end + len(self.tail)
+        # Counted from the right, starting at 0, even positions weigh 3.
+        weights = [3 if (length - index) % 2 else 1 for index in range(length)]
+        fixed_sum = sum(
+            weight * int(digit)
+            for weight, digit in zip(
+                weights[:head_length] + weights[code_end:],
+                self.head + self.tail,
+                strict=True,
+            )
+        )
+        check_weights = (fixed_sum, weights[head_length:code_end])
+        self._check_weights[code_length] = check_weights
+        return check_weights
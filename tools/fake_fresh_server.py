@@ -0,0 +1,256 @@
+import json
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .rate_limiter import TokenBucket
+
+ENDPOINTS = ("ARTICLE.SVC", "MAINGROUP.SVC", "MultiMedia.SVC")
+
+ReceivedRequest = namedtuple(
+    "ReceivedRequest",
+    ["endpoint", "headers", "body", "status_code", "result", "received_at", "method"],
+)
+# A scripted response: an HTTP status code, or an @Fresh result code with its
+# description for a processed request that @Fresh rejected.
+ScriptedResponse = namedtuple(
+    "ScriptedResponse", ["status_code", "result", "description"]
+)
+
+
+class FakeFreshServer:
+    """An in-process stand-in for the @Fresh API, for tests and load tests.
+
+    It accepts posts to the article, main group and multimedia endpoints under
+    ``url`` and answers like @Fresh does, after ``latency`` seconds (a number,
+    or a dict of endpoint to number). What it accepted is kept in ``data``, per
+    endpoint and ``DataId``, and can be listed page by page with a GET of the
+    ``GET`` path of the endpoint, passing ``PageNumber`` (from 1) and
+    ``PageSize``. Misbehaviour can be configured:
+
+    - ``error_rate``: share of requests answered with a 500 error,
+    - ``failure_rate``: share of requests answered with a failed ``Result``,
+    - ``rate_limit``: requests per second (with bursts of ``rate_limit_burst``)
+      above which requests are answered with a 429, asking to retry after
+      ``retry_after`` seconds,
+    - ``fail_next()``: answer the next requests with the given responses.
+
+    Random failures are drawn from a generator seeded with ``seed``, so runs
+    can be reproduced. Every request is recorded in ``requests``. ``reset()``
+    forgets the requests and the data, like a reset scale.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        failure_rate=0.0,
+        rate_limit=0.0,
+        rate_limit_burst=1,
+        retry_after=1,
+        credentials=None,
+        seed=None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.bucket = TokenBucket(rate_limit, rate_limit_burst) if rate_limit else None
+        self.retry_after = retry_after
+        self.credentials = credentials
+        self.requests = []
+        self.data = {endpoint: {} for endpoint in ENDPOINTS}
+        self._random = random.Random(seed)
+        self._scripted = deque()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFreshHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/API/V1"
+
+    def fail_next(self, count=1, status_code=500, result=None, description=""):
+        """Answer the next ``count`` requests with an error or a failed result."""
+        with self._lock:
+            self._scripted.extend(
+                [ScriptedResponse(status_code, result, description)] * count
+            )
+
+    def received(self, endpoint=None):
+        """Return the bodies posted (to the endpoint), in order of arrival."""
+        with self._lock:
+            return [
+                request.body
+                for request in self.requests
+                if request.method == "POST"
+                and (endpoint is None or request.endpoint == endpoint)
+            ]
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+            self._scripted.clear()
+            for records in self.data.values():
+                records.clear()
+
+    def _get_latency(self, endpoint):
+        if isinstance(self.latency, dict):
+            return self.latency.get(endpoint, 0.0)
+        return self.latency
+
+    def _respond(self, endpoint, headers, body, method="POST"):
+        """Return the answer to a request, as (status code, headers, json body)."""
+        with self._lock:
+            scripted = self._scripted.popleft() if self._scripted else None
+            draw = self._random.random()
+        if self.credentials and not self._is_authorized(headers):
+            response = (401, {}, {"Result": -1, "ResultDescription": "Login failed"})
+        elif self.bucket and not self.bucket.try_acquire():
+            response = (429, {"Retry-After": str(self.retry_after)}, {})
+        elif scripted and scripted.status_code == 429:
+            response = (429, {"Retry-After": str(self.retry_after)}, {})
+        elif scripted and scripted.result is None:
+            response = (scripted.status_code, {}, {})
+        elif scripted:
+            response = self._failed_result(scripted.result, scripted.description)
+        elif draw < self.error_rate:
+            response = (500, {}, {})
+        elif draw < self.error_rate + self.failure_rate:
+            response = self._failed_result(-2, "Validation failed")
+        elif method == "GET":
+            response = (200, {}, self._list_result(endpoint, body))
+        else:
+            response = (200, {}, self._succeeded_result(body))
+        with self._lock:
+            data_id = body.get("DataId") if method == "POST" else None
+            if data_id is not None and response[2].get("Result") == 1:
+                self.data[endpoint][data_id] = body
+            self.requests.append(
+                ReceivedRequest(
+                    endpoint,
+                    headers,
+                    body,
+                    response[0],
+                    response[2].get("Result"),
+                    time.time(),
+                    method,
+                )
+            )
+        return response
+
+    def _is_authorized(self, headers):
+        try:
+            login = json.loads(headers.get("ApplicationLogIn", ""))
+        except ValueError:
+            return False
+        return (login.get("User"), login.get("Password")) == tuple(self.credentials)
+
+    @staticmethod
+    def _failed_result(result, description):
+        return 200, {}, {"Result": result, "ResultDescription": description}
+
+    def _list_result(self, endpoint, params):
+        page_number = max(int(params.get("PageNumber", 1)), 1)
+        page_size = max(int(params.get("PageSize", 100)), 1)
+        with self._lock:
+            records = [
+                self.data[endpoint][data_id] for data_id in sorted(self.data[endpoint])
+            ]
+        start = (page_number - 1) * page_size
+        return {
+            "Result": 1,
+            "ResultDescription": "Ok",
+            "DataList": records[start : start + page_size],
+            "TotalCount": len(records),
+        }
+
+    @staticmethod
+    def _succeeded_result(body):
+        data_id = body.get("DataId", 0) if isinstance(body, dict) else 0
+        return {
+            "Result": 1,
+            "ResultDescription": "Ok",
+            "DataId": data_id,
+            "Post": [],
+            "Validation": [],
+        }
+
+
+class FakeFreshHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        endpoint = self._get_endpoint("POST")
+        if not endpoint:
+            return
+        try:
+            body = json.loads(content)
+        except ValueError:
+            self._send(400, {}, {})
+            return
+        self._respond(endpoint, body, "POST")
+
+    def do_GET(self):
+        endpoint = self._get_endpoint("GET")
+        if not endpoint:
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        params = {name: values[-1] for name, values in query.items()}
+        try:
+            self._respond(endpoint, params, "GET")
+        except ValueError:
+            self._send(400, {}, {})
+
+    def _get_endpoint(self, method):
+        """Return the endpoint of the request, or answer with a 404."""
+        segments = urlsplit(self.path).path.strip("/").split("/")
+        if len(segments) < 2 or segments[-1] != method:
+            self._send(404, {}, {})
+            return None
+        endpoint = segments[-2]
+        if endpoint not in ENDPOINTS:
+            self._send(404, {}, {})
+            return None
+        return endpoint
+
+    def _respond(self, endpoint, body, method):
+        fake = self.server.fake
+        latency = fake._get_latency(endpoint)
+        if latency:
+            time.sleep(latency)
+        self._send(*fake._respond(endpoint, dict(self.headers), body, method))
+
+    def _send(self, status_code, headers, body):
+        content = json.dumps(body).encode("utf-8") if body else b""
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
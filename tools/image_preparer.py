@@ -0,0 +1,84 @@
+import base64
+import binascii
+import io
+from collections import namedtuple
+
+from PIL import Image
+
+from odoo.tools.image import ImageProcess
+from odoo.tools.lru import LRU
+
+from .sync_metrics import sync_metrics
+
+ImageOptions = namedtuple("ImageOptions", ["max_size", "output_format", "quality"])
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def sniff_image_format(image_base64):
+    """Guess the format of a base64 image from its header, or return None."""
+    try:
+        header = base64.b64decode(image_base64[:16])
+    except (binascii.Error, ValueError):
+        return None
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class ImagePreparer:
+    """Downscale and re-encode product images, cached per process."""
+
+    _cache = LRU(32)
+    _format_cache = LRU(256)
+
+    @classmethod
+    def get_format(cls, image_base64, source_hash=None):
+        """Return the format of the image for @Fresh, sniffed or read with PIL."""
+        if source_hash:
+            image_format = cls._format_cache.get(source_hash)
+            if image_format:
+                return image_format
+
+        image_format = sniff_image_format(image_base64)
+        if not image_format:
+            image = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+            image_format = image.format.lower().replace("jpeg", "jpg")
+
+        if source_hash:
+            cls._format_cache[source_hash] = image_format
+        return image_format
+
+    @classmethod
+    @sync_metrics.timed("image_prepare")
+    def prepare(cls, image_base64, options, source_hash=None):
+        """Return the prepared image as a (base64 string, format) tuple."""
+        cache_key = (source_hash, options) if source_hash else None
+        if cache_key:
+            prepared = cls._cache.get(cache_key)
+            if prepared:
+                return prepared
+
+        image = ImageProcess(base64.b64decode(image_base64))
+        if options.max_size:
+            image.resize(max_width=options.max_size, max_height=options.max_size)
+        output = image.image_quality(
+            quality=options.quality or 0, output_format=options.output_format or ""
+        )
+        output_base64 = base64.b64encode(output)
+        prepared = (
+            output_base64.decode("utf-8"),
+            cls.get_format(output_base64),
+        )
+
+        if cache_key:
+            cls._cache[cache_key] = prepared
+        return prepared
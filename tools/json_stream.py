@@ -0,0 +1,42 @@
+class JsonStream:
+    """File-like request body that is read from a list of byte chunks.
+
+    Large values, like base64 encoded images, can be passed as chunks of their
+    own, so the body is streamed into the request without first building the
+    complete JSON document in memory. ``requests`` uses ``len()`` for the
+    Content-Length header and ``read()`` to send the body.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, chunks):
+        self._chunks = [memoryview(chunk) for chunk in chunks]
+        self._length = sum(chunk.nbytes for chunk in self._chunks)
+        self._index = 0
+        self._offset = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            data = self.read(self.CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+    # The file-like read() that http.client sends the body with, not the ORM one
+    def read(self, size=-1):  # pylint: disable=method-required-super
+        if size is None or size < 0:
+            size = self._length
+        output = bytearray()
+        while len(output) < size and self._index < len(self._chunks):
+            chunk = self._chunks[self._index]
+            end = min(self._offset + size - len(output), chunk.nbytes)
+            output += chunk[self._offset : end]
+            if end == chunk.nbytes:
+                self._index += 1
+                self._offset = 0
+            else:
+                self._offset = end
+        return bytes(output)
@@ -0,0 +1,34 @@
+import hashlib
+import json
+
+
+def normalize(value, shape=None):
+    """Return the value of a payload in a form that can be compared.
+
+    @Fresh returns records with more fields than were sent to it, filled with
+    their defaults. When the ``shape`` is given, a payload as it is sent, only
+    the keys of the shape are kept, and keys the shape has but the value is
+    missing become None. Numbers compare by value, so 250.0 equals 250.
+    """
+    if isinstance(value, dict):
+        if isinstance(shape, dict):
+            return {key: normalize(value.get(key), shape[key]) for key in shape}
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if isinstance(shape, list) and len(shape) == len(value):
+            return [
+                normalize(item, item_shape)
+                for item, item_shape in zip(value, shape, strict=True)
+            ]
+        return [normalize(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def get_digest(payload, shape=None):
+    """Hash the normalized payload, see ``normalize()``."""
+    normalized = json.dumps(
+        normalize(payload, shape), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
@@ -1,64 +1,182 @@
-import base64
-import io
+import hashlib
 import json
-import re
 
-from PIL import Image
+from .image_preparer import ImagePreparer
+from .json_stream import JsonStream
+from .sync_metrics import sync_metrics
 
 
 class ProductTransformer:
+    # Product fields read by the payload builders below. Changes to other fields
+    # don't affect what is sent to @Fresh.
+    ARTICLE_FIELDS = (
+        "plu_code",
+        "name",
+        "ingredients",
+        "list_price",
+        "standard_price",
+        "categ_id",
+    )
+    IMAGE_FIELDS = ("plu_code", "name", "image_1920")
+    CATEGORY_FIELDS = ("name", "external_digi_id")
+
+    @classmethod
+    def fingerprint(cls, values, field_names):
+        """Hash the given field values as returned by ``read()``."""
+        normalized = []
+        for field_name in field_names:
+            value = values.get(field_name)
+            if isinstance(value, tuple):
+                # Many2one fields are read as (id, display_name)
+                value = value[0]
+            elif isinstance(value, bytes):
+                value = hashlib.sha1(value).hexdigest()
+            normalized.append(value)
+        return hashlib.sha1(
+            json.dumps(normalized, default=str).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def transform_product_to_payload(cls, product):
+        return cls.transform_products_to_payloads(product)[0]
+
+    @classmethod
+    @sync_metrics.timed("transform", "article")
+    def transform_products_to_payloads(cls, products):
+        """Build the article payloads of the products, with one read() per model."""
+        with sync_metrics.measure("read", "article"):
+            product_rows = products.read(cls.ARTICLE_FIELDS, load=None)
+            categories = products.env["product.category"].browse(
+                {row["categ_id"] for row in product_rows if row["categ_id"]}
+            )
+            category_rows = {
+                row["id"]: row
+                for row in categories.read(
+                    ["external_digi_id", "barcode_rule_id"], load=None
+                )
+            }
+            rules = products.env["barcode.rule"].browse(
+                {
+                    row["barcode_rule_id"]
+                    for row in category_rows.values()
+                    if row["barcode_rule_id"]
+                }
+            )
+            # The parsed patterns are cached by write date, and built from the
+            # pattern and encoding, so a cache miss doesn't query the rules again
+            rule_rows = {
+                row["id"]: row
+                for row in rules.read(
+                    ["pattern", "encoding", "digi_barcode_type_id", "write_date"],
+                    load=None,
+                )
+            }
+            barcode_patterns = {rule.id: rule._get_barcode_pattern() for rule in rules}
+
+        payloads = []
+        for product_row in product_rows:
+            category_row = category_rows.get(product_row["categ_id"])
+            rule_id = category_row and category_row["barcode_rule_id"]
+            payloads.append(
+                json.dumps(
+                    cls._build_product_payload(
+                        product_row,
+                        category_row,
+                        rule_rows.get(rule_id),
+                        barcode_patterns.get(rule_id),
+                    )
+                )
+            )
+        return payloads
+
     @classmethod
-    def transform_product_to_payload(self, product):
+    def _build_product_payload(cls, product, category, barcode_rule, barcode_pattern):
         data = {}
-        data["DataId"] = product.plu_code
+        data["DataId"] = product["plu_code"]
         data["Names"] = [
             {
                 "Reference": "Nederlands",
-                "DdFormatCommodity": f"01000000{product.name}",
+                "DdFormatCommodity": f"01000000{product['name']}",
             }
         ]
-        if product.ingredients:
-            data["Names"][0]["DdFormatIngredient"] = f"01000000{product.ingredients}"
-        if product.list_price:
-            data["UnitPrice"] = int(product.list_price * 100)
-        if product.standard_price:
-            data["CostPrice"] = int(product.standard_price * 100)
-        if product.categ_id.id:
-            data["MainGroupDataId"] = product.categ_id.external_digi_id
+        if product["ingredients"]:
+            data["Names"][0]["DdFormatIngredient"] = f"01000000{product['ingredients']}"
+        if product["list_price"]:
+            data["UnitPrice"] = int(product["list_price"] * 100)
+        if product["standard_price"]:
+            data["CostPrice"] = int(product["standard_price"] * 100)
+        if category:
+            data["MainGroupDataId"] = category["external_digi_id"]
         data["StatusFields"] = {"PiecesArticle": False}
         if (
-            product
-            and getattr(product, "categ_id", None)
-            and getattr(product.categ_id, "barcode_rule_id", None)
-            and getattr(product.categ_id.barcode_rule_id, "digi_barcode_type_id", None)
+            barcode_rule
+            and barcode_rule["digi_barcode_type_id"]
+            and barcode_pattern.flag is not None
         ):
-            matches = re.match(r"^(\d{2}).*", product.categ_id.barcode_rule_id.pattern)
+            barcode_id = barcode_rule["digi_barcode_type_id"]
+            data["NormalBarcode1"] = {
+                "BarcodeDataType": {
+                    "Id": barcode_id,
+                },
+                "Code": 0,
+                "DataId": 1,
+                "Flag": barcode_pattern.flag,
+                "Type": {
+                    "Id": barcode_id,
+                },
+            }
+
+        return data
 
-            if matches:
-                flag = matches.group(1)
-                if flag.isnumeric():
-                    barcode_id = product.categ_id.barcode_rule_id.digi_barcode_type_id
-                    data["NormalBarcode1"] = {
-                        "BarcodeDataType": {
-                            "Id": barcode_id,
-                        },
-                        "Code": 0,
-                        "DataId": 1,
-                        "Flag": int(flag),
-                        "Type": {
-                            "Id": barcode_id,
-                        },
-                    }
+    @classmethod
+    @sync_metrics.timed("transform", "image")
+    def transform_product_to_image_payload(
+        cls, product, image_options=None, source_hash=None
+    ):
+        image_input, image_format = cls._get_image_input(
+            product, image_options, source_hash
+        )
+        payload = cls._build_image_payload(
+            product, image_input.decode("utf-8"), image_format
+        )
+        return json.dumps(payload)
+
+    @classmethod
+    @sync_metrics.timed("transform", "image")
+    def stream_product_to_image_payload(
+        cls, product, image_options=None, source_hash=None
+    ):
+        """Build the same payload as above, streaming the base64 image as is."""
+        image_input, image_format = cls._get_image_input(
+            product, image_options, source_hash
+        )
+        payload = cls._build_image_payload(product, "", image_format)
+        # Quotes inside JSON strings are escaped, so this can only match the key.
+        placeholder = '"OriginalInput": ""'
+        head, tail = json.dumps(payload).split(placeholder)
+        return JsonStream(
+            [
+                f'{head}"OriginalInput": "'.encode(),
+                image_input,
+                f'"{tail}'.encode(),
+            ]
+        )
 
-        return json.dumps(data)
+    @classmethod
+    def _get_image_input(cls, product, image_options, source_hash):
+        """Return the base64 encoded image to send, as bytes, and its format."""
+        if image_options:
+            image_input, image_format = ImagePreparer.prepare(
+                product.image_1920, image_options, source_hash
+            )
+            return image_input.encode("utf-8"), image_format
+        image_format = ImagePreparer.get_format(product.image_1920, source_hash)
+        return product.image_1920, image_format
 
     @classmethod
-    def transform_product_to_image_payload(cls, product):
+    def _build_image_payload(cls, product, image_input, image_format):
         image_name = product.name.lower().replace(" ", "_")
         payload = {"DataId": product.plu_code}
-        image_data = base64.b64decode(product.image_1920)
-        image = Image.open(io.BytesIO(image_data))
-        image_format = image.format.lower().replace("jpeg", "jpg")
         payload["Links"] = [
             {
                 "DataId": product.plu_code,
@@ -69,7 +187,7 @@ class ProductTransformer:
                 },
             }
         ]
-        payload["OriginalInput"] = product.image_1920.decode("utf-8")
+        payload["OriginalInput"] = image_input
         payload["Names"] = [
             {
                 "DataId": 1,
@@ -78,9 +196,10 @@ class ProductTransformer:
             }
         ]
         payload["InputFormat"] = image_format
-        return json.dumps(payload)
+        return payload
 
     @classmethod
+    @sync_metrics.timed("transform", "category")
     def transform_product_category_to_payload(cls, product_category):
         payload = {
             "DataId": product_category.external_digi_id,
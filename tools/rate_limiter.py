@@ -0,0 +1,111 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average, with bursts up to ``burst``."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the number of seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self):
+        """Take a token if one is available right now, without waiting for one."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class AdaptiveConcurrency:
+    """Limit the requests in flight, growing on success, halving on overload."""
+
+    def __init__(self, maximum, minimum=1, decrease_factor=0.5):
+        self.maximum = max(maximum, 1)
+        self.minimum = min(max(minimum, 1), self.maximum)
+        self.decrease_factor = decrease_factor
+        self.limit = float(self.maximum)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        with self._condition:
+            acquired = self._condition.wait_for(
+                lambda: self._in_flight < int(self.limit), timeout
+            )
+            if acquired:
+                self._in_flight += 1
+            return acquired
+
+    def release(self, overloaded=False):
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class Throttle:
+    """Rate limit and adaptive concurrency limit for the requests to one server."""
+
+    def __init__(self, rate, burst, max_concurrency):
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+
+    def acquire(self):
+        self.concurrency.acquire()
+        if self.bucket:
+            self.bucket.acquire()
+
+    def release(self, overloaded=False):
+        self.concurrency.release(overloaded)
+
+
+class ThrottleRegistry:
+    """Keeps a throttle per key, shared by the threads of this worker process."""
+
+    def __init__(self):
+        self._throttles = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, rate, burst, max_concurrency):
+        signature = (rate, burst, max_concurrency)
+        with self._lock:
+            entry = self._throttles.get(key)
+            if entry and entry[0] == signature:
+                return entry[1]
+            throttle = Throttle(rate, burst, max_concurrency)
+            self._throttles[key] = (signature, throttle)
+            return throttle
+
+
+throttle_registry = ThrottleRegistry()
@@ -0,0 +1,26 @@
+import random
+
+TRANSPORT = "transport"
+THROTTLING = "throttling"
+SERVER = "server"
+PAYLOAD = "payload"
+
+RETRYABLE_CATEGORIES = (TRANSPORT, THROTTLING, SERVER)
+
+
+class RetryPolicy:
+    """Exponential backoff up to ``max_delay``, with half of the delay random."""
+
+    def __init__(self, base_delay, max_delay, max_attempts, rng=random.random):
+        self.base_delay = max(base_delay, 1)
+        self.max_delay = max(max_delay, self.base_delay)
+        self.max_attempts = max_attempts
+        self._rng = rng
+
+    def should_retry(self, category, attempt):
+        return category in RETRYABLE_CATEGORIES and attempt < self.max_attempts
+
+    def get_delay(self, attempt, minimum=0):
+        """Return the number of seconds to wait after the given failed attempt."""
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return max(minimum, cap / 2 + self._rng() * cap / 2)
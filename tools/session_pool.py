@@ -0,0 +1,41 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """Keeps a pooled ``requests.Session`` per key for the lifetime of the process."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, signature, headers_factory, pool_size):
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry and entry[0] == signature:
+                return entry[1]
+            if entry:
+                entry[1].close()
+            session = self._create_session(headers_factory(), pool_size)
+            self._sessions[key] = (signature, session)
+            return session
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry:
+            entry[1].close()
+
+    @staticmethod
+    def _create_session(headers, pool_size):
+        session = requests.Session()
+        session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+session_pool = SessionPool()
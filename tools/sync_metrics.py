@@ -0,0 +1,187 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+_logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the buckets of the latency histograms.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class StageStats:
+    """Counters and a latency histogram of one stage of the sync."""
+
+    def __init__(self):
+        self.count = 0
+        self.failure_count = 0
+        self.retry_count = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.payload_bytes = 0
+        # One bucket per bound, and one for everything above the last bound.
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, duration, ok=True, payload_bytes=0, retries=0):
+        self.count += 1
+        self.failure_count += 0 if ok else 1
+        self.retry_count += retries
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.payload_bytes += payload_bytes
+        self.buckets[get_bucket(duration)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.failure_count += other.failure_count
+        self.retry_count += other.retry_count
+        self.total_duration += other.total_duration
+        self.max_duration = max(self.max_duration, other.max_duration)
+        self.payload_bytes += other.payload_bytes
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets, strict=True)]
+
+
+def get_bucket(duration):
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if duration <= bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def get_percentile(buckets, percentile):
+    """Estimate a percentile as the upper bound of its bucket, None if unbounded."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    threshold = total * percentile / 100
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen >= threshold:
+            return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else None
+    return None
+
+
+class Observation:
+    """Extra data of a measured block, which the block may fill in."""
+
+    __slots__ = ("payload_bytes", "retries")
+
+    def __init__(self):
+        self.payload_bytes = 0
+        self.retries = 0
+
+
+class SyncMetrics:
+    """Collects timings and counters of the sync in memory, per process.
+
+    Observations are grouped by key (identifying the client), stage and
+    endpoint. Code that has no access to the client, like the payload
+    transformers, records under the key of the enclosing ``scope()``, and is
+    not recorded outside of one. The collected stats are taken out with
+    ``pop()`` to be stored.
+
+    Exporters registered with ``add_exporter()`` are called with every
+    observation, as ``exporter(key, stage, endpoint, duration, ok,
+    payload_bytes, retries)``, so they can feed an external metrics system.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._stats = {}
+        self._exporters = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def scope(self, key):
+        previous = getattr(self._local, "key", None)
+        self._local.key = key
+        try:
+            yield
+        finally:
+            self._local.key = previous
+
+    def get_scope(self):
+        return getattr(self._local, "key", None)
+
+    @contextmanager
+    def measure(self, stage, endpoint="", key=None):
+        """Record the duration of the block, yielding an ``Observation`` to fill in."""
+        observation = Observation()
+        key = key if key is not None else self.get_scope()
+        if key is None:
+            yield observation
+            return
+        started_at = self._clock()
+        ok = False
+        try:
+            yield observation
+            ok = True
+        finally:
+            self.record(
+                key,
+                stage,
+                endpoint,
+                self._clock() - started_at,
+                ok=ok,
+                payload_bytes=observation.payload_bytes,
+                retries=observation.retries,
+            )
+
+    def timed(self, stage, endpoint=""):
+        """Decorate a function to record its duration in the current scope."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.measure(stage, endpoint):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(
+        self, key, stage, endpoint, duration, ok=True, payload_bytes=0, retries=0
+    ):
+        with self._lock:
+            stats = self._stats.setdefault((key, stage, endpoint), StageStats())
+            stats.add(duration, ok, payload_bytes, retries)
+            exporters = list(self._exporters)
+        for exporter in exporters:
+            try:
+                exporter(key, stage, endpoint, duration, ok, payload_bytes, retries)
+            except Exception:
+                _logger.exception("Sync metrics exporter %s failed", exporter)
+
+    def pop(self, key):
+        """Take out the stats of the key, as a {(stage, endpoint): stats} dict."""
+        with self._lock:
+            popped = {
+                (stage, endpoint): self._stats.pop((k, stage, endpoint))
+                for k, stage, endpoint in list(self._stats)
+                if k == key
+            }
+        return popped
+
+    def restore(self, key, popped):
+        """Put back stats taken out with ``pop()`` that could not be stored."""
+        with self._lock:
+            for (stage, endpoint), stats in popped.items():
+                self._stats.setdefault((key, stage, endpoint), StageStats()).merge(
+                    stats
+                )
+
+    def add_exporter(self, exporter):
+        with self._lock:
+            self._exporters.append(exporter)
+
+    def remove_exporter(self, exporter):
+        with self._lock:
+            if exporter in self._exporters:
+                self._exporters.remove(exporter)
+
+
+sync_metrics = SyncMetrics()